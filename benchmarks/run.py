@@ -0,0 +1,277 @@
+"""
+Воспроизводимый бенчмарк конвейера на синтетических данных.
+
+Пример запуска из корня репозитория:
+    python -m benchmarks.run --offers 2000 --latency 0.02 --failure-rate 0.01
+Сравнение двух результатов:
+    python -m benchmarks.run --compare old.json new.json
+"""
+import argparse
+import json
+import logging
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime as dt
+from pathlib import Path
+
+from benchmarks.server import StandInServer
+from benchmarks.synthetic import generate_feed
+
+RESULTS_FOLDER = Path(__file__).parent / 'results'
+"""Директория с результатами бенчмарков."""
+
+FEED_NAME = 'yandex.xml'
+"""Имя синтетического фида."""
+
+
+def _git_commit() -> str:
+    """Функция, возвращает хеш текущего коммита."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _peak_rss_mb() -> float:
+    """
+    Функция, возвращает пиковый RSS процесса в мегабайтах.
+
+    Это максимум за все время процесса, поэтому для стадии
+    записывается его прирост за время стадии.
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _list_files(folder: Path) -> list[str]:
+    """Функция, возвращает отсортированные имена файлов директории."""
+    if not folder.exists():
+        return []
+    return sorted(file.name for file in folder.iterdir() if file.is_file())
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """Функция, выполняет стадии конвейера и замеряет каждую отдельно."""
+    work_dir = Path(tempfile.mkdtemp(prefix='uvi_bench_'))
+
+    from handler.feeds_handler import FeedHandler
+    from handler.feeds_save import FeedSaver
+    from handler.image_handler import FeedImage
+    from handler.links import LinkChecker
+    from handler.publisher import get_publisher
+    from handler.variants import default_variant
+    from handler.verify import ImageVerifier
+
+    folders = {
+        name: str(work_dir / name)
+        for name in ('feeds', 'images', 'new_images', 'new_feeds')
+    }
+    state_folder = str(work_dir / 'state')
+    for folder in folders.values():
+        get_publisher(folder, state_folder)
+    stages: dict[str, dict] = {}
+
+    def measure(stage: str, func, unit: str, count=None):
+        peak_before = _peak_rss_mb()
+        start_time = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start_time
+        if callable(count):
+            count = count()
+        stages[stage] = {
+            'seconds': round(seconds, 3),
+            unit: count,
+            f'{unit}_per_sec': round(count / seconds, 1) if seconds else None,
+            'peak_rss_growth_mb': round(_peak_rss_mb() - peak_before, 1),
+        }
+
+    with StandInServer(
+        {},
+        image_size=(args.image_size, args.image_size),
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    ) as server:
+        server.feeds[FEED_NAME] = generate_feed(
+            f'{server.base_url}/images',
+            offers=args.offers,
+            pictures_per_offer=args.pictures,
+            shared_ratio=args.shared_ratio,
+            seed=args.seed
+        )
+        variant = default_variant(folder=folders['new_images'])
+
+        measure(
+            'fetch_feeds',
+            lambda: FeedSaver(
+                (f'{server.base_url}/feeds/{FEED_NAME}',),
+                feeds_folder=folders['feeds']
+            ).save_xml(),
+            'offers',
+            args.offers
+        )
+        image_client = FeedImage(
+            [FEED_NAME],
+            images=[],
+            feeds_folder=folders['feeds'],
+            image_folder=folders['images'],
+            variants=(variant,),
+            workers=args.workers,
+            links=LinkChecker(state_folder=state_folder),
+            preflight=args.preflight
+        )
+        measure(
+            'fetch_images',
+            image_client.get_images,
+            'images',
+            lambda: len(_list_files(work_dir / 'images'))
+        )
+        stages['fetch_images']['http_requests'] = server.requests
+
+        image_client.images = _list_files(work_dir / 'images')
+        measure(
+            'frame',
+            image_client.add_frame,
+            'images',
+            lambda: len(_list_files(work_dir / 'new_images'))
+        )
+
+        verifier = ImageVerifier(image_client, state_folder=state_folder)
+        measure(
+            'verify_full',
+            lambda: verifier.verify(full=True),
+            'images',
+            lambda: verifier.summary['checked']
+        )
+
+        def rewrite(verify: bool = False) -> FeedHandler:
+            return FeedHandler(
+                FEED_NAME,
+                feeds_folder=folders['feeds'],
+                new_feeds_folder=folders['new_feeds'],
+                new_image_folder=folders['new_images'],
+                address_ftp_images=variant.url_prefix,
+                verify=verify,
+                state_folder=state_folder
+            ).replace_images().save()
+
+        measure('rewrite', rewrite, 'offers', args.offers)
+
+        framed = _list_files(work_dir / 'new_images')
+        if args.changed_ratio:
+            step = max(1, round(1 / args.changed_ratio))
+            for filename in framed[::step]:
+                (work_dir / 'new_images' / filename).unlink()
+        measure('rewrite_patched', rewrite, 'offers', args.offers)
+        stages['rewrite_patched']['identical'] = rewrite(
+            verify=True
+        ).patch_verified
+
+    if not args.keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'commit': _git_commit(),
+        'created_at': dt.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'params': {
+            key: value for key, value in vars(args).items()
+            if key not in ('compare', 'output', 'keep')
+        },
+        'stages': stages,
+        'total_seconds': round(
+            sum(stage['seconds'] for stage in stages.values()),
+            3
+        ),
+        'process_peak_rss_mb': _peak_rss_mb(),
+        'work_dir': str(work_dir) if args.keep else None,
+    }
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Функция, выводит сравнение двух результатов по стадиям."""
+    with open(old_path, encoding='utf-8') as file:
+        old = json.load(file)
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)
+    if old['params'] != new['params']:
+        print('Внимание: параметры запусков различаются')
+    print(f'{old["commit"]} -> {new["commit"]}')
+    for stage, new_stage in new['stages'].items():
+        old_stage = old['stages'].get(stage)
+        if not old_stage:
+            print(f'  {stage}: {new_stage["seconds"]} сек. (новая стадия)')
+            continue
+        ratio = new_stage['seconds'] / old_stage['seconds'] if (
+            old_stage['seconds']
+        ) else float('inf')
+        print(
+            f'  {stage}: {old_stage["seconds"]} -> {new_stage["seconds"]} '
+            f'сек. (x{round(ratio, 2)})'
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Функция, разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description='Бенчмарк конвейера.')
+    parser.add_argument('--offers', type=int, default=1000)
+    parser.add_argument('--pictures', type=int, default=3)
+    parser.add_argument('--shared-ratio', type=float, default=0.0)
+    parser.add_argument('--image-size', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--preflight',
+        action='store_true',
+        help='Проверять ссылки на изображения перед скачиванием.'
+    )
+    parser.add_argument(
+        '--changed-ratio',
+        type=float,
+        default=0.01,
+        help='Доля обрамленных изображений от 0 до 1, удаляемых перед '
+        'инкрементальной перезаписью фида, 0 - ничего не удалять.'
+    )
+    parser.add_argument('--output', type=str, default='')
+    parser.add_argument(
+        '--keep',
+        action='store_true',
+        help='Не удалять рабочую директорию с файлами запуска.'
+    )
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+    if not 0 <= args.changed_ratio <= 1:
+        parser.error('--changed-ratio должен быть от 0 до 1')
+    return args
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(handlers=[logging.NullHandler()])
+    if args.compare:
+        compare(*args.compare)
+        return
+    result = run_benchmark(args)
+    RESULTS_FOLDER.mkdir(parents=True, exist_ok=True)
+    output = Path(args.output) if args.output else RESULTS_FOLDER / (
+        f'{result["commit"]}_{dt.now().strftime("%Y%m%d%H%M%S")}.json'
+    )
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+    print(json.dumps(result['stages'], ensure_ascii=False, indent=2))
+    print(f'Результат сохранен в {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import generate_jpeg
+
+
+class StandInServer:
+    """
+    Локальная замена сервера поставщика.
+
+    Отдает фиды по /feeds/<имя> и сгенерированные JPEG
+    по /images/<имя>. Для изображений добавляет задержку latency
+    секунд и с вероятностью failure_rate отвечает ошибкой 503
+    или обрывает тело ответа.
+    """
+
+    def __init__(
+        self,
+        feeds: dict[str, bytes],
+        image_size: tuple[int, int] = (1000, 1000),
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 1
+    ) -> None:
+        self.feeds = feeds
+        self.image_size = image_size
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.randomizer = random.Random(seed)
+        self.requests = 0
+        self._images: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        """Адрес сервера."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _image(self, name: str) -> bytes:
+        """Защищенный метод, возвращает изображение из кэша."""
+        with self._lock:
+            if name not in self._images:
+                self._images[name] = generate_jpeg(name, self.image_size)
+            return self._images[name]
+
+    def _roll_failure(self) -> str | None:
+        """Защищенный метод, выбирает внедряемую ошибку."""
+        with self._lock:
+            self.requests += 1
+            if self.randomizer.random() >= self.failure_rate:
+                return None
+            return self.randomizer.choice(('status', 'truncate'))
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                """Журнал запросов отключен, чтобы не влиять на замеры."""
+
+            def _send(self, body: bytes, content_type: str, failure=None):
+                if failure == 'status':
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command == 'HEAD':
+                    return
+                if failure == 'truncate':
+                    body = body[:len(body) // 3]
+                self.wfile.write(body)
+
+            def do_GET(self):  # noqa: N802
+                _, section, *rest = self.path.split('/')
+                name = '/'.join(rest)
+                if section == 'feeds' and name in stand_in.feeds:
+                    self._send(stand_in.feeds[name], 'application/xml')
+                elif section == 'images' and name:
+                    if stand_in.latency:
+                        time.sleep(stand_in.latency)
+                    self._send(
+                        stand_in._image(name),
+                        'image/jpeg',
+                        stand_in._roll_failure()
+                    )
+                else:
+                    self.send_error(404)
+
+            do_HEAD = do_GET  # noqa: N815
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
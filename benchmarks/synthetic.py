@@ -0,0 +1,81 @@
+import random
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+TECHNICAL_SUFFIX = 'Technical.jpg'
+"""Суффикс технических изображений, отбрасываемых фильтром."""
+
+
+def generate_feed(
+    base_url: str,
+    offers: int = 1000,
+    pictures_per_offer: int = 3,
+    shared_ratio: float = 0.0,
+    seed: int = 1
+) -> bytes:
+    """
+    Функция, генерирует YML-фид в формате yandex.xml.
+
+    У каждого оффера pictures_per_offer изображений: сначала '_1.jpg',
+    '_2.jpg' и т.д., последним идет техническое изображение.
+    Доля shared_ratio ссылок указывает на общий пул изображений,
+    как у поставщика с одинаковыми картинками у разных офферов.
+    """
+    randomizer = random.Random(seed)
+    shared_pool = max(1, offers // 20)
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<yml_catalog date="2025-01-01 00:00">',
+        '  <shop>',
+        '    <name>uvi</name>',
+        '    <company>Synthetic</company>',
+        '    <url>https://example.invalid</url>',
+        '    <currencies>',
+        '      <currency id="RUR" rate="1"/>',
+        '    </currencies>',
+        '    <categories>',
+        '      <category id="1">Одежда</category>',
+        '      <category id="2" parentId="1">Платья</category>',
+        '    </categories>',
+        '    <offers>',
+    ]
+    for offer_id in range(1, offers + 1):
+        available = 'true' if randomizer.random() < 0.8 else 'false'
+        lines.append(f'      <offer id="{offer_id}" available="{available}">')
+        lines.append(f'        <url>https://example.invalid/{offer_id}</url>')
+        lines.append(f'        <price>{randomizer.randint(500, 9000)}</price>')
+        lines.append('        <currencyId>RUR</currencyId>')
+        lines.append('        <categoryId>2</categoryId>')
+        for index in range(1, pictures_per_offer + 1):
+            if index == pictures_per_offer and pictures_per_offer > 1:
+                name = f'{offer_id}_{TECHNICAL_SUFFIX}'
+            elif randomizer.random() < shared_ratio:
+                name = f'shared{randomizer.randrange(shared_pool)}_{index}.jpg'
+            else:
+                name = f'{offer_id}_{index}.jpg'
+            lines.append(f'        <picture>{base_url}/{name}</picture>')
+        lines.append(
+            f'        <name>{escape(f"Платье № {offer_id} & пояс")}</name>'
+        )
+        lines.append('        <vendor>Synthetic</vendor>')
+        lines.append(
+            '        <description>Синтетическое описание товара.'
+            '</description>'
+        )
+        lines.append('      </offer>')
+    lines.extend(['    </offers>', '  </shop>', '</yml_catalog>', ''])
+    return '\n'.join(lines).encode('utf-8')
+
+
+def generate_jpeg(name: str, size: tuple[int, int]) -> bytes:
+    """Функция, генерирует детерминированный JPEG для имени файла."""
+    randomizer = random.Random(name)
+    color = tuple(randomizer.randrange(256) for _ in range(3))
+    image = Image.new('RGB', size, color)
+    band = Image.new('RGB', (size[0], size[1] // 4), color[::-1])
+    image.paste(band, (0, size[1] // 3))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
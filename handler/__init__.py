@@ -0,0 +1,7 @@
+"""
+Пакет обработки фидов.
+
+Импорт logging_config регистрирует класс логгера с уровнем INFO_BOT
+до создания логгеров модулей.
+"""
+from handler import logging_config  # noqa: F401
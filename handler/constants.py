@@ -62,3 +62,147 @@ NEW_IMAGE_FOLDER = os.getenv('NEW_IMAGE_FOLDER', 'new_images')
 
 ENCODING = 'utf-8'
 """Кодировка по умолчанию."""
+
+IMAGE_VARIANTS_CONFIG = os.getenv('IMAGE_VARIANTS_CONFIG', '')
+"""Путь к JSON-файлу со списком вариантов обработки изображений."""
+
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))
+"""Максимальное число пикселей одного изображения."""
+
+PIXEL_BUDGET = int(os.getenv('PIXEL_BUDGET', 300_000_000))
+"""Лимит суммарного числа декодированных пикселей в обработке."""
+
+RENDER_PIXEL_FACTOR = 4
+"""Число полноразмерных буферов, создаваемых при наложении рамки."""
+
+FRAME_WORKERS = int(os.getenv('FRAME_WORKERS', 1))
+"""Количество потоков наложения рамки."""
+
+STATE_FOLDER = os.getenv('STATE_FOLDER', 'state')
+"""Константа стокового названия директории служебного состояния."""
+
+DEFERRED_PLAN_FILE = 'deferred_plan.json'
+"""Имя файла с работами, отложенными до следующего запуска."""
+
+RUN_TIME_BUDGET = int(os.getenv('RUN_TIME_BUDGET', 0))
+"""Бюджет времени запуска в секундах, 0 - без ограничения."""
+
+EST_DOWNLOAD_SECONDS = 0.5
+"""Оценка времени скачивания одного изображения в секундах."""
+
+EST_RENDER_SECONDS = 0.3
+"""Оценка времени построения одного варианта изображения в секундах."""
+
+EST_REWRITE_SECONDS = 0.0005
+"""Оценка времени перезаписи одного оффера в фиде в секундах."""
+
+PLAN_BATCH_SIZE = 32
+"""Размер пачки изображений, передаваемой на наложение рамки."""
+
+REQUEST_TIMEOUT = (10, 60)
+"""Таймауты соединения и чтения HTTP-запросов в секундах."""
+
+DAEMON_INTERVAL = int(os.getenv('DAEMON_INTERVAL', 3600))
+"""Интервал между циклами резидентного режима в секундах."""
+
+DAEMON_SOCKET = os.getenv('DAEMON_SOCKET', '')
+"""Путь к unix-сокету управления резидентным режимом."""
+
+DAEMON_SOCKET_TIMEOUT = 5
+"""Сколько секунд ждать команду от подключившегося к сокету клиента."""
+
+DAEMON_REINDEX_CYCLES = int(os.getenv('DAEMON_REINDEX_CYCLES', 24))
+"""Через сколько циклов полностью перечитывать директории изображений."""
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+"""Включен ли сбор метрик."""
+
+METRICS_FOLDER = os.getenv('METRICS_FOLDER', 'metrics')
+"""Константа стокового названия директории с выгрузкой метрик."""
+
+METRICS_PREFIX = 'uvi_feed_handler'
+"""Префикс имен метрик Prometheus."""
+
+PROFILE_STAGES = os.getenv('PROFILE_STAGES', '')
+"""Стадии для профилирования через запятую, 'all' - все, пусто - выкл."""
+
+PROFILE_MODES = os.getenv('PROFILE_MODES', 'cpu,memory')
+"""Режимы профилирования через запятую: cpu, memory. RSS пишется всегда."""
+
+PROFILE_TOP_LINES = 30
+"""Количество строк в отчетах профилировщиков."""
+
+HISTORY_ENABLED = os.getenv('HISTORY_ENABLED', 'true').lower() == 'true'
+"""Включена ли запись истории запусков."""
+
+HISTORY_DB = 'history.sqlite3'
+"""Имя файла базы истории запусков в директории состояния."""
+
+HISTORY_BASELINE_RUNS = int(os.getenv('HISTORY_BASELINE_RUNS', 10))
+"""Количество прошлых запусков для расчета базовой линии."""
+
+HISTORY_REGRESSION_MARGIN = float(os.getenv('HISTORY_REGRESSION_MARGIN', 0.5))
+"""Допустимое превышение базовой линии, доля."""
+
+HISTORY_MIN_SECONDS = 1.0
+"""Стадии короче этого времени не проверяются на регрессию."""
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+"""Уровень логирования."""
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+"""Формат строк лога: text или json."""
+
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', 1))
+"""Количество потоков скачивания изображений."""
+
+SHOPS_CONFIG = os.getenv('SHOPS_CONFIG', '')
+"""Путь к JSON-файлу со списком магазинов."""
+
+SHOPS_FOLDER = os.getenv('SHOPS_FOLDER', 'shops')
+"""Константа стокового названия директории с файлами магазинов."""
+
+PUBLISH_FOLDER = 'publish'
+"""Поддиректория состояния с манифестами опубликованных файлов."""
+
+FEED_INDEX_FOLDER = 'index'
+"""Поддиректория директории фидов с индексами офферов."""
+
+PICTURE_RULES_CONFIG = os.getenv('PICTURE_RULES_CONFIG', '')
+"""Путь к JSON-файлу с правилами отбора изображений офферов."""
+
+PATCH_STATE_FOLDER = 'rewrite'
+"""Поддиректория состояния с индексами перезаписанных фидов."""
+
+REWRITE_VERIFY = os.getenv('REWRITE_VERIFY', 'false').lower() == 'true'
+"""Сверять ли инкрементальную перезапись фида с полной."""
+
+XML_OUTPUT_ENCODING = 'windows-1251'
+"""Кодировка перезаписанных фидов."""
+
+VERIFY_SAMPLE_SIZE = int(os.getenv('VERIFY_SAMPLE_SIZE', 200))
+"""Число файлов каждой директории изображений, проверяемых за цикл."""
+
+VERIFY_WORKERS = int(os.getenv('VERIFY_WORKERS', 4))
+"""Количество потоков полной проверки целостности изображений."""
+
+VERIFY_STATE_FILE = 'verify_cursor.json'
+"""Имя файла с позициями выборочной проверки изображений."""
+
+IMAGE_PREFLIGHT = os.getenv('IMAGE_PREFLIGHT', 'false').lower() == 'true'
+"""Проверять ли ссылки на изображения запросами HEAD перед скачиванием."""
+
+PREFLIGHT_RANGE_BYTES = 1024
+"""Размер частичного GET, если сервер не поддерживает HEAD."""
+
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', 50_000_000))
+"""Максимальный размер файла изображения поставщика в байтах."""
+
+DEAD_LINK_TTL = int(os.getenv('DEAD_LINK_TTL', 86400))
+"""Сколько секунд не запрашивать нерабочую ссылку на изображение."""
+
+DEAD_LINKS_FILE = 'dead_links.json'
+"""Имя файла кэша нерабочих ссылок в директории состояния."""
+
+STEM_MIGRATION_FILE = 'stem_migration.json'
+"""Имя файла с отметками миграции имен изображений."""
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+import requests
+
+from handler.constants import (DAEMON_INTERVAL, DAEMON_REINDEX_CYCLES,
+                               DAEMON_SOCKET, DAEMON_SOCKET_TIMEOUT,
+                               FEEDS_FOLDER, RUN_TIME_BUDGET)
+from handler.decorators import time_of_script
+from handler.feeds_save import FeedSaver
+from handler.image_handler import FeedImage
+from handler.logging_config import setup_logging
+from handler.migrations import StemMigrator
+from handler.planner import RunPlanner
+from handler.utils import get_filenames_list
+from handler.variants import load_variants
+from handler.verify import ImageVerifier
+
+logger = logging.getLogger(__name__)
+
+
+class FeedDaemon:
+    """
+    Класс резидентного режима обработки фидов.
+
+    Между циклами сохраняет кэш изображений, загруженные рамки
+    и пулы HTTP-соединений. Циклы запускаются по расписанию,
+    по сигналу SIGUSR1 или командой 'run' в unix-сокет. Каждый цикл
+    выборочно проверяет целостность изображений, команда 'verify'
+    запускает цикл с полной проверкой.
+    """
+
+    def __init__(
+        self,
+        interval: int = DAEMON_INTERVAL,
+        socket_path: str = DAEMON_SOCKET,
+        time_budget: int = RUN_TIME_BUDGET,
+        reindex_cycles: int = DAEMON_REINDEX_CYCLES
+    ) -> None:
+        self.interval = interval
+        self.socket_path = socket_path
+        self.time_budget = time_budget
+        self.reindex_cycles = reindex_cycles
+        self.variants = load_variants()
+        self.session = requests.Session()
+        self.save_client = FeedSaver(session=self.session)
+        self.image_client = FeedImage(
+            [],
+            images=[],
+            variants=self.variants,
+            session=self.session
+        )
+        self.verifier = ImageVerifier(self.image_client)
+        self.cycles = 0
+        self.last_cycle: dict = {}
+        self._wakeup = threading.Event()
+        self._full_verify = threading.Event()
+        self._stopped = threading.Event()
+
+    def trigger(self) -> None:
+        """Метод запускает внеочередной цикл."""
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """Метод останавливает резидентный режим после текущего цикла."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    @time_of_script
+    def run_cycle(self) -> None:
+        """Метод выполняет один инкрементальный цикл обработки."""
+        if self.cycles and self.reindex_cycles and (
+            self.cycles % self.reindex_cycles == 0
+        ):
+            logging.info('Плановое перечитывание директорий изображений')
+            self.image_client.reset_image_index()
+
+        self.save_client.save_xml()
+        self.image_client.filenames = get_filenames_list(FEEDS_FOLDER)
+        if StemMigrator(self.image_client.filenames, self.variants).migrate():
+            self.image_client.reset_image_index()
+
+        full_verify = self._full_verify.is_set()
+        self._full_verify.clear()
+        self.verifier.verify(full=full_verify)
+
+        planner = RunPlanner(
+            self.image_client,
+            self.variants,
+            self.time_budget
+        )
+        planner.execute(planner.build())
+
+    def _run_cycle_safely(self) -> None:
+        """Защищенный метод, выполняет цикл, не останавливая сервис."""
+        start_time = time.monotonic()
+        status = 'SUCCESS'
+        try:
+            self.run_cycle()
+        except Exception as error:
+            status = 'ERROR'
+            logging.error('Цикл завершился с ошибкой: %s', error)
+        self.cycles += 1
+        self.last_cycle = {
+            'cycle': self.cycles,
+            'status': status,
+            'finished_at': time.time(),
+            'duration': round(time.monotonic() - start_time, 3)
+        }
+
+    def _handle_connection(self, connection: socket.socket) -> None:
+        """Защищенный метод, обрабатывает команду из сокета."""
+        with connection:
+            connection.settimeout(DAEMON_SOCKET_TIMEOUT)
+            try:
+                command = connection.recv(64).decode(
+                    'utf-8',
+                    errors='replace'
+                ).strip()
+            except TimeoutError:
+                logging.warning(
+                    'Команда сокета не получена за %s сек.',
+                    DAEMON_SOCKET_TIMEOUT
+                )
+                return
+            if command == 'run':
+                self.trigger()
+                reply = 'ok'
+            elif command == 'verify':
+                self._full_verify.set()
+                self.trigger()
+                reply = 'ok'
+            elif command == 'stop':
+                self.stop()
+                reply = 'ok'
+            elif command == 'status':
+                reply = json.dumps(self.last_cycle, ensure_ascii=False)
+            else:
+                reply = f'unknown command: {command}'
+            connection.sendall(f'{reply}\n'.encode('utf-8'))
+
+    def _serve_socket(self) -> None:
+        """Защищенный метод, принимает команды через unix-сокет."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.socket_path)
+            server.listen()
+            server.settimeout(1)
+            while not self._stopped.is_set():
+                try:
+                    connection, _ = server.accept()
+                except TimeoutError:
+                    continue
+                try:
+                    self._handle_connection(connection)
+                except OSError as error:
+                    logging.warning('Ошибка команды сокета: %s', error)
+        os.unlink(self.socket_path)
+
+    def _install_signals(self) -> None:
+        """
+        Защищенный метод, назначает обработчики сигналов.
+
+        Обработчики ничего не делают: номер сигнала записывается
+        в канал через signal.set_wakeup_fd, а команды выполняет
+        отдельный поток. Вызов Event.set() прямо в обработчике
+        может зависнуть, если сигнал пришел, пока основной поток
+        держит блокировку того же Event.
+        """
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(write_fd, False)
+        signal.set_wakeup_fd(write_fd)
+        for signum in (signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: None)
+        threading.Thread(
+            target=self._watch_signals,
+            args=(read_fd,),
+            daemon=True
+        ).start()
+
+    def _watch_signals(self, read_fd: int) -> None:
+        """Защищенный метод, выполняет команды по полученным сигналам."""
+        while True:
+            for signum in os.read(read_fd, 64):
+                if signum == signal.SIGUSR1:
+                    self.trigger()
+                elif signum in (signal.SIGTERM, signal.SIGINT):
+                    self.stop()
+
+    def serve_forever(self) -> None:
+        """Метод запускает циклы до получения команды остановки."""
+        self._install_signals()
+        if self.socket_path:
+            threading.Thread(target=self._serve_socket, daemon=True).start()
+        logger.bot_event(
+            'Резидентный режим запущен, интервал %s сек.',
+            self.interval
+        )
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            self._run_cycle_safely()
+            self._wakeup.wait(self.interval)
+        self.session.close()
+        logger.bot_event(
+            'Резидентный режим остановлен после %s циклов',
+            self.cycles
+        )
+
+
+if __name__ == '__main__':
+    setup_logging()
+    FeedDaemon().serve_forever()
@@ -5,13 +5,33 @@ import time
 from datetime import datetime as dt
 from http.client import IncompleteRead
 
-import requests
-
 from handler.constants import (ATTEMPTION_LOAD_FEED, DATE_FORMAT,
                                DELAY_FOR_RETRY, TIME_FORMAT)
-from handler.logging_config import setup_logging
+from handler.history import record_run
+from handler.metrics import metrics
+from handler.profiling import profile_stage
+from handler.publisher import flush_publishers
+
+
+def _network_errors() -> tuple:
+    """
+    Функция, возвращает сетевые исключения для повторных попыток.
+
+    requests импортируется при первом вызове, чтобы модуль
+    декораторов не тянул его в стадии без сетевых запросов.
+    """
+    import requests
 
-setup_logging()
+    return (
+        IncompleteRead,
+        ConnectionResetError,
+        ConnectionError,
+        ConnectionAbortedError,
+        ConnectionRefusedError,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.ReadTimeout
+    )
 
 
 def time_of_script(func):
@@ -20,6 +40,7 @@ def time_of_script(func):
     def wrapper(*args, **kwargs):
         start_ts = time.time()
         date_str = dt.now().strftime(DATE_FORMAT)
+        metrics.start_run()
 
         print(
             f'Функция {func.__name__} начала работу '
@@ -58,6 +79,18 @@ def time_of_script(func):
             }
 
             logging.info(json.dumps(log_record, ensure_ascii=False))
+            flush_publishers()
+            metrics.inc('runs_total', command=func.__name__, status=status)
+            metrics.set_gauge(
+                'last_run_seconds',
+                exec_time_sec,
+                command=func.__name__
+            )
+            try:
+                metrics.export()
+            except OSError as error:
+                logging.warning('Не удалось записать метрики: %s', error)
+            record_run(log_record)
 
     return wrapper
 
@@ -68,7 +101,8 @@ def time_of_function(func):
 
     Замеряет время выполнения декорируемой функции и логирует результат
     в секундах и минутах. Время округляется до 3 знаков после запятой
-    для секунд и до 2 знаков для минут.
+    для секунд и до 2 знаков для минут. Время пишется в гистограмму
+    stage_seconds с меткой статуса и при успехе, и при ошибке.
 
     Args:
         func (callable): Декорируемая функция, время выполнения которой
@@ -78,11 +112,22 @@ def time_of_function(func):
         callable: Обёрнутая функция с добавленной функциональностью
         замера времени.
     """
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
         logging.info('Функция %s начала работу', func.__name__)
-        result = func(*args, **kwargs)
-        execution_time = round(time.time() - start_time, 3)
+        status = 'ERROR'
+        try:
+            result = func(*args, **kwargs)
+            status = 'SUCCESS'
+        finally:
+            execution_time = round(time.time() - start_time, 3)
+            metrics.observe(
+                'stage_seconds',
+                execution_time,
+                stage=func.__name__,
+                status=status
+            )
         logging.info(
             'Функция %s завершила работу. '
             'Время выполнения - %s сек. или %s мин.',
@@ -91,7 +136,7 @@ def time_of_function(func):
             round(execution_time / 60, 2)
         )
         return result
-    return wrapper
+    return profile_stage(wrapper)
 
 
 def retry_on_network_error(
@@ -109,16 +154,7 @@ def retry_on_network_error(
                 attempt += 1
                 try:
                     return func(*args, **kwargs)
-                except (
-                    IncompleteRead,
-                    ConnectionResetError,
-                    ConnectionError,
-                    ConnectionAbortedError,
-                    ConnectionRefusedError,
-                    requests.exceptions.ConnectionError,
-                    requests.exceptions.ChunkedEncodingError,
-                    requests.exceptions.ReadTimeout
-                ) as error:
+                except _network_errors() as error:
                     last_exception = error
                     if attempt < max_attempts:
                         delay = delays[attempt - 1] if attempt - \
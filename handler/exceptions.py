@@ -36,3 +36,19 @@ class StructureXMLError(ValueError):
 
 class MissingFolderError(Exception):
     """Ошибка отсутствующей директории."""
+
+
+class VariantConfigError(ValueError):
+    """Ошибка конфигурации вариантов изображений."""
+
+
+class ImageTooLargeError(ValueError):
+    """Ошибка превышения лимита пикселей изображения."""
+
+
+class ShopConfigError(ValueError):
+    """Ошибка конфигурации магазинов."""
+
+
+class PictureRuleError(ValueError):
+    """Ошибка конфигурации правил отбора изображений."""
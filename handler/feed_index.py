@@ -0,0 +1,257 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from xml.parsers import expat
+
+from handler.constants import FEED_INDEX_FOLDER
+from handler.picture_rules import (PictureRule, load_rules, rules_fingerprint,
+                                   select_pictures)
+from handler.publisher import atomic_write
+
+INDEX_VERSION = 2
+"""Версия формата индекса, при смене индексы перестраиваются."""
+
+
+@dataclass(frozen=True)
+class IndexedOffer:
+    """
+    Запись индекса об одном оффере фида.
+
+    Хранит атрибуты элемента offer, ссылки picture в порядке
+    следования, отобранные правилами пары (имя файла без расширения,
+    ссылка) и границы элемента в байтах файла фида
+    (start - начало '<offer', end - позиция после закрывающего тега).
+    """
+
+    offer_id: str
+    start: int
+    end: int
+    attrs: dict = field(default_factory=dict)
+    pictures: tuple[str, ...] = ()
+    selected: tuple[tuple[str, str], ...] = ()
+
+    def get(self, name: str, default=None):
+        """Метод возвращает атрибут оффера, как Element.get."""
+        return self.attrs.get(name, default)
+
+    def to_list(self) -> list:
+        """Метод возвращает компактное представление для JSON."""
+        return [
+            self.offer_id,
+            self.start,
+            self.end,
+            self.attrs,
+            list(self.pictures),
+            [list(pair) for pair in self.selected]
+        ]
+
+    @classmethod
+    def from_list(cls, raw: list) -> 'IndexedOffer':
+        """Метод восстанавливает запись из компактного представления."""
+        offer_id, start, end, attrs, pictures, selected = raw
+        return cls(
+            offer_id,
+            start,
+            end,
+            attrs,
+            tuple(pictures),
+            tuple(tuple(pair) for pair in selected)
+        )
+
+
+def element_end(data: bytes, index: int) -> int:
+    """
+    Функция, возвращает позицию после элемента по индексу expat
+    из обработчика конца элемента.
+
+    Для элемента с закрывающим тегом индекс указывает на '</',
+    для пустого элемента - уже на позицию после него.
+    """
+    if data.startswith(b'</', index):
+        return data.index(b'>', index) + 1
+    return index
+
+
+def scan_offer_ranges(data: bytes) -> list[tuple[int, int, int]]:
+    """
+    Функция, возвращает границы элементов offer и их глубину
+    (корневой элемент - 0) в порядке следования.
+    """
+    parser = expat.ParserCreate()
+    ranges: list[tuple[int, int, int]] = []
+    starts: list[int] = []
+    depth = [0]
+
+    def start_element(name: str, attrs: dict) -> None:
+        if name == 'offer':
+            starts.append(parser.CurrentByteIndex)
+        depth[0] += 1
+
+    def end_element(name: str) -> None:
+        depth[0] -= 1
+        if name == 'offer':
+            ranges.append((
+                starts.pop(),
+                element_end(data, parser.CurrentByteIndex),
+                depth[0]
+            ))
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.Parse(data, True)
+    return ranges
+
+
+def scan_feed(
+    data: bytes,
+    rules: tuple[PictureRule, ...]
+) -> list[IndexedOffer]:
+    """
+    Функция, за один проход парсера проверяет фид и строит индекс.
+
+    Правила отбора изображений применяются к каждому офферу
+    сразу по окончании его элемента. Синтаксические ошибки XML
+    поднимают expat.ExpatError.
+    """
+    parser = expat.ParserCreate()
+    offers: list[IndexedOffer] = []
+    current: dict = {}
+    text: list[str] = []
+
+    def start_element(name: str, attrs: dict) -> None:
+        if name == 'offer':
+            current.update(
+                start=parser.CurrentByteIndex,
+                attrs=attrs,
+                pictures=[]
+            )
+        elif name == 'picture' and current:
+            text.clear()
+            parser.CharacterDataHandler = text.append
+
+    def end_element(name: str) -> None:
+        if name == 'picture' and current:
+            parser.CharacterDataHandler = None
+            url = ''.join(text).strip()
+            if url:
+                current['pictures'].append(url)
+        elif name == 'offer' and current:
+            end = element_end(data, parser.CurrentByteIndex)
+            offer_id = str(current['attrs'].get('id'))
+            offers.append(IndexedOffer(
+                offer_id,
+                current['start'],
+                end,
+                current['attrs'],
+                tuple(current['pictures']),
+                tuple(select_pictures(
+                    rules,
+                    offer_id,
+                    current['attrs'],
+                    current['pictures']
+                ))
+            ))
+            current.clear()
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.Parse(data, True)
+    return offers
+
+
+def selected_image_dict(
+    offers: list[IndexedOffer],
+    files: dict[str, str]
+) -> dict[str, list[str]]:
+    """
+    Функция, возвращает словарь '{offer_id}: [filenames]'.
+
+    Файлы берутся из files ('{имя без расширения}: {имя файла}')
+    в порядке, в котором правила отобрали изображения оффера.
+    """
+    image_dict: dict[str, list[str]] = {}
+    for offer in offers:
+        filenames = [
+            files[image_stem] for image_stem, _ in offer.selected
+            if image_stem in files
+        ]
+        if filenames:
+            image_dict.setdefault(offer.offer_id, []).extend(filenames)
+    return image_dict
+
+
+def index_path(feeds_folder: str, filename: str) -> Path:
+    """Функция, возвращает путь к индексу фида."""
+    folder_path = Path(__file__).parent.parent / feeds_folder
+    return folder_path / FEED_INDEX_FOLDER / f'{filename}.json'
+
+
+def save_feed_index(
+    feeds_folder: str,
+    filename: str,
+    offers: list[IndexedOffer],
+    rules: tuple[PictureRule, ...]
+) -> None:
+    """
+    Функция, сохраняет индекс фида.
+
+    В индекс записываются размер и время изменения файла фида
+    и отпечаток правил отбора, по которым проверяется
+    актуальность индекса.
+    """
+    stat = (Path(__file__).parent.parent / feeds_folder / filename).stat()
+    file_path = index_path(feeds_folder, filename)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(file_path, json.dumps(
+        {
+            'version': INDEX_VERSION,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rules': rules_fingerprint(rules),
+            'offers': [offer.to_list() for offer in offers],
+        },
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8'))
+
+
+def load_feed_index(
+    feeds_folder: str,
+    filename: str,
+    rules: tuple[PictureRule, ...] | None = None
+) -> list[IndexedOffer]:
+    """
+    Функция, возвращает индекс офферов фида.
+
+    Если индекса нет или он не соответствует файлу фида
+    или правилам отбора, фид сканируется заново
+    и индекс перезаписывается.
+    """
+    rules = rules or load_rules()
+    feed_path = Path(__file__).parent.parent / feeds_folder / filename
+    stat = feed_path.stat()
+    file_path = index_path(feeds_folder, filename)
+    try:
+        with open(file_path, encoding='utf-8') as file:
+            raw_index = json.load(file)
+        if (
+            raw_index['version'],
+            raw_index['size'],
+            raw_index['mtime_ns'],
+            raw_index['rules']
+        ) == (
+            INDEX_VERSION,
+            stat.st_size,
+            stat.st_mtime_ns,
+            rules_fingerprint(rules)
+        ):
+            return [IndexedOffer.from_list(raw) for raw in raw_index['offers']]
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as error:
+        logging.warning('Индекс фида %s поврежден: %s', filename, error)
+    logging.info('Индекс фида %s устарел, фид сканируется заново', filename)
+    offers = scan_feed(feed_path.read_bytes(), rules)
+    save_feed_index(feeds_folder, filename, offers, rules)
+    return offers
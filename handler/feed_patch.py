@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from handler.constants import PATCH_STATE_FOLDER, STATE_FOLDER
+from handler.feed_index import IndexedOffer, scan_offer_ranges
+from handler.metrics import metrics
+from handler.publisher import atomic_write
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+"""Версия формата состояния, при смене выполняется полная перезапись."""
+
+
+def _digest(data: bytes) -> str:
+    """Функция, возвращает хеш байтов."""
+    return hashlib.sha1(data).hexdigest()
+
+
+class FeedPatcher:
+    """
+    Класс инкрементальной перезаписи фида на уровне байтов.
+
+    После каждой перезаписи сохраняет индекс блоков '<offer>'
+    опубликованного файла: ключ содержимого оффера -> границы блока.
+    При следующей перезаписи блоки неизменившихся офферов копируются
+    из опубликованного файла, заново строятся только блоки
+    изменившихся офферов. Участки между офферами копируются
+    из опубликованного файла, поэтому патч возможен, только если
+    часть фида вне офферов не изменилась и офферы идут подряд
+    одним списком. Иначе вызывающий код выполняет полную перезапись.
+    """
+
+    def __init__(
+        self,
+        output_folder: str,
+        output_name: str,
+        state_folder: str = STATE_FOLDER
+    ) -> None:
+        self.output_path = (
+            Path(__file__).parent.parent / output_folder / output_name
+        )
+        folder_hash = _digest(
+            str(self.output_path.parent.resolve()).encode()
+        )[:10]
+        state_path = Path(__file__).parent.parent / state_folder
+        self.state_path = state_path / PATCH_STATE_FOLDER / (
+            f'{self.output_path.parent.name}_{folder_hash}_'
+            f'{output_name}.json'
+        )
+
+    @staticmethod
+    def _is_single_run(source: bytes, offers: list[IndexedOffer]) -> bool:
+        """
+        Защищенный метод, проверяет, что офферы идут подряд
+        и разделены только пробельными символами.
+        """
+        if not offers:
+            return False
+        return all(
+            not source[previous.end:offer.start].strip()
+            for previous, offer in zip(offers, offers[1:])
+        )
+
+    @staticmethod
+    def _skeleton(source: bytes, offers: list[IndexedOffer]) -> str:
+        """Защищенный метод, возвращает хеш фида вне списка офферов."""
+        return _digest(
+            source[:offers[0].start] + b'\0' + source[offers[-1].end:]
+        )
+
+    def _load_state(self) -> dict | None:
+        """Защищенный метод, читает состояние прошлой перезаписи."""
+        try:
+            with open(self.state_path, encoding='utf-8') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logging.warning(
+                'Состояние перезаписи %s повреждено: %s',
+                self.state_path,
+                error
+            )
+            return None
+        if state.get('version') != STATE_VERSION:
+            return None
+        return state
+
+    def _save_state(self, state: dict) -> None:
+        """Защищенный метод, сохраняет состояние перезаписи."""
+        state['version'] = STATE_VERSION
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(
+            self.state_path,
+            json.dumps(state, separators=(',', ':')).encode('utf-8')
+        )
+
+    def forget(self) -> None:
+        """Метод удаляет состояние, следующая перезапись будет полной."""
+        self.state_path.unlink(missing_ok=True)
+
+    def patch(
+        self,
+        source: bytes,
+        offers: list[IndexedOffer],
+        keys: list[str],
+        render_offer
+    ) -> bytes | None:
+        """
+        Метод строит новый файл из опубликованного.
+
+        render_offer(offer, depth) возвращает байты блока оффера
+        без хвостовых пробелов. Возвращает None, если патч невозможен.
+        """
+        state = self._load_state()
+        if not state or not self._is_single_run(source, offers):
+            return None
+        if self._skeleton(source, offers) != state['skeleton']:
+            logging.info('Фид %s изменился вне офферов', self.output_path.name)
+            return None
+        try:
+            old = self.output_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        if len(old) != state['size'] or _digest(old) != state['hash']:
+            logging.info(
+                'Опубликованный файл %s изменен вне перезаписи',
+                self.output_path.name
+            )
+            return None
+
+        old_view = memoryview(old)
+        blocks = state['blocks']
+        tail = state['tail'].encode('ascii')
+        depth = state['depth']
+        parts = [old_view[:state['prefix_end']]]
+        position = state['prefix_end']
+        new_blocks = {}
+        rendered = 0
+        for index, (offer, key) in enumerate(zip(offers, keys)):
+            if index:
+                parts.append(tail)
+                position += len(tail)
+            if key in blocks:
+                start, end = blocks[key]
+                block = old_view[start:end]
+            else:
+                try:
+                    block = render_offer(offer, depth)
+                except Exception as error:
+                    logging.warning(
+                        'Не удалось построить оффер %s для патча: %s',
+                        offer.offer_id,
+                        error
+                    )
+                    return None
+                rendered += 1
+            new_blocks[key] = [position, position + len(block)]
+            parts.append(block)
+            position += len(block)
+        parts.append(old_view[state['suffix_start']:])
+        output = b''.join(parts)
+
+        state.update(
+            blocks=new_blocks,
+            suffix_start=position,
+            size=len(output),
+            hash=_digest(output)
+        )
+        self._save_state(state)
+        metrics.inc('feed_offers_rendered_total', rendered)
+        metrics.inc('feed_offers_copied_total', len(offers) - rendered)
+        logger.info(
+            'Фид %s: перестроено офферов %s, скопировано %s',
+            self.output_path.name,
+            rendered,
+            len(offers) - rendered
+        )
+        return output
+
+    def remember(
+        self,
+        source: bytes,
+        offers: list[IndexedOffer],
+        keys: list[str],
+        output: bytes
+    ) -> None:
+        """Метод сохраняет индекс блоков после полной перезаписи."""
+        ranges = scan_offer_ranges(output)
+        if not self._is_single_run(source, offers) or (
+            len(ranges) != len(offers)
+        ):
+            self.forget()
+            return
+        depth = ranges[0][2]
+        gaps = {
+            output[previous[1]:current[0]]
+            for previous, current in zip(ranges, ranges[1:])
+        }
+        tail = gaps.pop() if gaps else b'\n' + b'  ' * depth
+        if gaps or tail.strip() or any(
+            offer_range[2] != depth for offer_range in ranges
+        ):
+            self.forget()
+            return
+        self._save_state({
+            'skeleton': self._skeleton(source, offers),
+            'depth': depth,
+            'tail': tail.decode('ascii'),
+            'prefix_end': ranges[0][0],
+            'suffix_start': ranges[-1][1],
+            'size': len(output),
+            'hash': _digest(output),
+            'blocks': {
+                key: [start, end]
+                for key, (start, end, _) in zip(keys, ranges)
+            },
+        })
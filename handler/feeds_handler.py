@@ -1,13 +1,21 @@
+import hashlib
 import logging
+import re
 import xml.etree.ElementTree as ET
+from pathlib import Path
 
-from handler.constants import (ADDRESS_FTP_IMAGES, FEEDS_FOLDER,
-                               NEW_FEEDS_FOLDER, NEW_IMAGE_FOLDER)
+from handler.constants import (ADDRESS_FTP_IMAGES, ENCODING, FEEDS_FOLDER,
+                               NEW_FEEDS_FOLDER, NEW_IMAGE_FOLDER,
+                               REWRITE_VERIFY, STATE_FOLDER,
+                               XML_OUTPUT_ENCODING)
 from handler.decorators import time_of_function
-from handler.logging_config import setup_logging
+from handler.feed_index import (IndexedOffer, load_feed_index,
+                                selected_image_dict)
+from handler.feed_patch import FeedPatcher
+from handler.metrics import metrics
 from handler.mixins import FileMixin
+from handler.picture_rules import PictureRule
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -22,14 +30,28 @@ class FeedHandler(FileMixin):
         filename,
         feeds_folder: str = FEEDS_FOLDER,
         new_feeds_folder: str = NEW_FEEDS_FOLDER,
-        new_image_folder: str = NEW_IMAGE_FOLDER
+        new_image_folder: str = NEW_IMAGE_FOLDER,
+        address_ftp_images: str = ADDRESS_FTP_IMAGES,
+        image_dict: dict | None = None,
+        verify: bool = REWRITE_VERIFY,
+        rules: tuple[PictureRule, ...] | None = None,
+        state_folder: str = STATE_FOLDER
     ) -> None:
         self.filename = filename
         self.feeds_folder = feeds_folder
         self.new_feeds_folder = new_feeds_folder
         self.new_image_folder = new_image_folder
+        self.address_ftp_images = address_ftp_images
+        self.image_dict = image_dict
+        self.verify = verify
+        self.rules = rules
+        self.state_folder = state_folder
+        self.rewrite_mode = ''
+        self.patch_verified: bool | None = None
         self._root = None
         self._is_modified = False
+        self._offers: list[IndexedOffer] = []
+        self._image_dict: dict = {}
 
     @property
     def root(self):
@@ -38,33 +60,99 @@ class FeedHandler(FileMixin):
             self._root = self._get_root(self.filename, self.feeds_folder)
         return self._root
 
+    def _replace_offer_pictures(self, offer, image_dict: dict) -> None:
+        """Защищенный метод, заменяет изображения одного оффера."""
+        offer_id = offer.get('id')
+        if not offer_id:
+            return
+        for picture in offer.findall('picture'):
+            offer.remove(picture)
+        for filename in image_dict.get(offer_id, ()):
+            picture_tag = ET.SubElement(offer, 'picture')
+            picture_tag.text = f'{self.address_ftp_images}/{filename}'
+
+    def _offer_key(self, source: bytes, offer: IndexedOffer) -> str:
+        """
+        Защищенный метод, возвращает ключ содержимого оффера
+        в перезаписанном фиде.
+        """
+        pictures = self._image_dict.get(offer.offer_id, ()) if (
+            offer.get('id')
+        ) else ('-',)
+        return hashlib.sha1(b'\0'.join((
+            source[offer.start:offer.end],
+            self.address_ftp_images.encode(),
+            '\n'.join(pictures).encode()
+        ))).hexdigest()
+
+    def _render_offer(
+        self,
+        source: bytes,
+        offer: IndexedOffer,
+        depth: int
+    ) -> bytes:
+        """
+        Защищенный метод, строит блок одного оффера так же,
+        как его строит полная перезапись фида.
+        """
+        parser = ET.XMLParser(encoding=self._source_encoding(source))
+        parser.feed(source[offer.start:offer.end])
+        element = parser.close()
+        self._replace_offer_pictures(element, self._image_dict)
+        self._indent(element, depth)
+        element.tail = None
+        return ET.tostring(element, encoding='unicode').encode(
+            XML_OUTPUT_ENCODING,
+            'xmlcharrefreplace'
+        )
+
+    @staticmethod
+    def _source_encoding(source: bytes) -> str:
+        """Защищенный метод, возвращает кодировку скачанного фида."""
+        match = re.match(
+            rb'(?:\xef\xbb\xbf)?<\?xml[^>]*encoding=["\']([\w.-]+)',
+            source[:256]
+        )
+        return match.group(1).decode('ascii') if match else ENCODING
+
+    def _render_full(self) -> bytes:
+        """Защищенный метод, полностью перестраивает фид."""
+        for offer in self.root.findall('.//offer'):
+            self._replace_offer_pictures(offer, self._image_dict)
+        return self._xml_bytes(self.root)
+
     @time_of_function
     def replace_images(self):
-        """Метод, подставляющий в фиды новые изображения."""
+        """
+        Метод, подставляющий в фиды новые изображения.
+
+        Изображения офферов определяются по индексу фида,
+        сам фид перестраивается при сохранении.
+        """
         deleted_images = 0
         input_images = 0
         try:
-            image_dict = self._get_image_dict(self.new_image_folder)
-            offers = self.root.findall('.//offer')
+            self._offers = load_feed_index(
+                self.feeds_folder,
+                self.filename,
+                self.rules
+            )
+            image_dict = self.image_dict
+            if image_dict is None:
+                image_dict = selected_image_dict(
+                    self._offers,
+                    self._get_files_dict(self.new_image_folder)
+                )
+            self._image_dict = image_dict
 
-            for offer in offers:
-                offer_id = offer.get('id')
-                if not offer_id:
+            for offer in self._offers:
+                if not offer.get('id'):
                     continue
-
-                pictures = offer.findall('picture')
-                for picture in pictures:
-                    offer.remove(picture)
-                deleted_images += len(pictures)
-
-                if offer_id in image_dict:
-                    for filename in image_dict[offer_id]:
-                        picture_tag = ET.SubElement(offer, 'picture')
-                        picture_tag.text = (
-                            f'{ADDRESS_FTP_IMAGES}/{filename}'
-                        )
-                        input_images += 1
-                        self._is_modified = True
+                deleted_images += len(offer.pictures)
+                input_images += len(image_dict.get(offer.offer_id, ()))
+            self._is_modified = bool(input_images)
+            metrics.inc('feed_pictures_removed_total', deleted_images)
+            metrics.inc('feed_pictures_added_total', input_images)
             logger.bot_event(
                 'Количество удаленных изображений в файле %s - %s',
                 self.filename,
@@ -80,17 +168,70 @@ class FeedHandler(FileMixin):
             logging.error('Ошибка в image_replacement: %s', error)
             raise
 
+    def _build_output(self, new_filename: str) -> bytes:
+        """
+        Защищенный метод, строит перезаписанный фид.
+
+        Сначала пробует патч опубликованного файла, при невозможности
+        патча выполняет полную перезапись. При verify результат патча
+        сверяется с полной перезаписью.
+        """
+        source = (
+            Path(__file__).parent.parent / self.feeds_folder / self.filename
+        ).read_bytes()
+        keys = [self._offer_key(source, offer) for offer in self._offers]
+        patcher = FeedPatcher(
+            self.new_feeds_folder,
+            new_filename,
+            self.state_folder
+        )
+        output = patcher.patch(
+            source,
+            self._offers,
+            keys,
+            lambda offer, depth: self._render_offer(source, offer, depth)
+        )
+        self.rewrite_mode = 'patched'
+        if output is not None and not self.verify:
+            metrics.inc('feed_rewrites_total', mode=self.rewrite_mode)
+            return output
+
+        full_output = self._render_full()
+        if output is not None:
+            self.patch_verified = output == full_output
+            if self.patch_verified:
+                metrics.inc('feed_rewrites_total', mode=self.rewrite_mode)
+                return output
+            metrics.inc('feed_patch_mismatches_total')
+            logging.error(
+                'Патч фида %s не совпал с полной перезаписью',
+                new_filename
+            )
+        self.rewrite_mode = 'full'
+        patcher.remember(source, self._offers, keys, full_output)
+        metrics.inc('feed_rewrites_total', mode=self.rewrite_mode)
+        return full_output
+
     def save(self, prefix: str = 'new'):
-        """Метод сохраняет файл, если были изменения."""
+        """
+        Метод публикует файл, если его содержимое
+        отличается от опубликованного.
+        """
         try:
             new_filename = f'{prefix}_{self.filename}'
 
-            if not self._is_modified:
-                self._save_xml(self.root, self.new_feeds_folder, new_filename)
-                logger.info('Файл обновлен без изменений')
+            with metrics.timer('feed_write_seconds'):
+                published = self._publish_file(
+                    self._build_output(new_filename),
+                    self.new_feeds_folder,
+                    new_filename
+                )
+            if not published:
+                logger.info(
+                    'Файл %s не изменился, публикация пропущена',
+                    new_filename
+                )
                 return self
-
-            self._save_xml(self.root, self.new_feeds_folder, new_filename)
             logger.info('Файл сохранён как %s', new_filename)
 
             self._is_modified = False
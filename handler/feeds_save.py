@@ -1,18 +1,20 @@
 import logging
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
 
 import requests
 from dotenv import load_dotenv
 
-from handler.constants import ENCODING, FEEDS_FOLDER
+from handler.constants import FEEDS_FOLDER, REQUEST_TIMEOUT
 from handler.decorators import retry_on_network_error, time_of_function
 from handler.exceptions import (EmptyFeedsListError, EmptyXMLError,
                                 InvalidXMLError)
+from handler.feed_index import IndexedOffer, save_feed_index, scan_feed
 from handler.feeds import FEEDS
-from handler.logging_config import setup_logging
+from handler.metrics import metrics
 from handler.mixins import FileMixin
+from handler.picture_rules import PictureRule, load_rules
+from handler.publisher import atomic_write
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -26,7 +28,9 @@ class FeedSaver(FileMixin):
     def __init__(
         self,
         feeds_list: tuple[str, ...] = FEEDS,
-        feeds_folder: str = FEEDS_FOLDER
+        feeds_folder: str = FEEDS_FOLDER,
+        session: requests.Session | None = None,
+        rules: tuple[PictureRule, ...] | None = None
     ) -> None:
         if not feeds_list:
             logging.error('Не передан список фидов.')
@@ -34,12 +38,18 @@ class FeedSaver(FileMixin):
 
         self.feeds_list = feeds_list
         self.feeds_folder = feeds_folder
+        self.session = session or requests.Session()
+        self.rules = rules or load_rules()
 
     @retry_on_network_error(max_attempts=3, delays=(2, 5, 10))
     def _get_file(self, feed: str):
         """Защищенный метод, получает фид по ссылке."""
         try:
-            response = requests.get(feed, stream=True, timeout=(10, 60))
+            response = self.session.get(
+                feed,
+                stream=True,
+                timeout=REQUEST_TIMEOUT
+            )
 
             if response.status_code == requests.codes.ok:
                 return response
@@ -61,29 +71,29 @@ class FeedSaver(FileMixin):
         """Защищенный метод, формирующий имя xml-файлу."""
         return feed.split('/')[-1]
 
-    def _validate_xml(self, xml_content: bytes) -> str:
+    def _validate_xml(self, xml_content: bytes) -> list[IndexedOffer]:
         """
-        Валидирует XML.
-        Возвращает декодированное содержимое.
+        Валидирует XML за один проход парсера.
+        Возвращает индекс офферов фида.
         """
         if not xml_content.strip():
             logging.error('Получен пустой XML-файл')
             raise EmptyXMLError('XML пуст')
         try:
-            decoded_content = xml_content.decode(ENCODING)
-        except UnicodeDecodeError:
-            logging.error('Ошибка декодирования XML-файла')
-            raise
-        try:
-            ET.fromstring(decoded_content)
-        except ET.ParseError as e:
+            return scan_feed(xml_content, self.rules)
+        except expat.ExpatError as e:
             logging.error('XML-файл содержит синтаксические ошибки')
             raise InvalidXMLError(f'XML содержит синтаксические ошибки: {e}')
-        return decoded_content
 
     @time_of_function
     def save_xml(self) -> None:
-        """Метод, сохраняющий фиды в xml-файлы"""
+        """
+        Метод, сохраняющий фиды в xml-файлы.
+
+        Фид сохраняется без изменений вместе с индексом офферов,
+        построенным при проверке, поэтому следующим стадиям
+        не нужно разбирать XML заново.
+        """
         total_files: int = len(self.feeds_list)
         saved_files = 0
         folder_path = self._make_dir(self.feeds_folder)
@@ -91,20 +101,27 @@ class FeedSaver(FileMixin):
             file_name = self._get_filename(feed)
             file_path = folder_path / file_name
             try:
-                response = self._get_file(feed)
-                xml_content = response.content
-                decoded_content = self._validate_xml(xml_content)
-                xml_tree = ET.fromstring(decoded_content)
-                self._indent(xml_tree)
-                tree = ET.ElementTree(xml_tree)
-                with open(file_path, 'wb') as file:
-                    tree.write(file, encoding=ENCODING, xml_declaration=True)
+                with metrics.timer('feed_download_seconds'):
+                    response = self._get_file(feed)
+                    xml_content = response.content
+                metrics.inc('feed_download_bytes_total', len(xml_content))
+                offers = self._validate_xml(xml_content)
+                atomic_write(file_path, xml_content)
+                save_feed_index(
+                    self.feeds_folder,
+                    file_name,
+                    offers,
+                    self.rules
+                )
                 saved_files += 1
+                metrics.inc('feeds_total', status='saved')
                 logging.info('Файл %s успешно сохранен', file_name)
             except requests.exceptions.RequestException as error:
+                metrics.inc('feeds_total', status='download_error')
                 logging.warning('Фид %s не получен: %s', file_name, error)
                 continue
             except (EmptyXMLError, InvalidXMLError) as error:
+                metrics.inc('feeds_total', status='invalid')
                 logging.error('Ошибка валидации XML %s: %s', file_name, error)
                 continue
             except Exception as error:
@@ -0,0 +1,303 @@
+import logging
+import resource
+import sqlite3
+import statistics
+import time
+from pathlib import Path
+
+from handler.constants import (HISTORY_BASELINE_RUNS, HISTORY_DB,
+                               HISTORY_ENABLED, HISTORY_MIN_SECONDS,
+                               HISTORY_REGRESSION_MARGIN, STATE_FOLDER)
+from handler.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STAGE_METRIC = 'stage_seconds{stage="%s",status="SUCCESS"}'
+"""Шаблон имени гистограммы длительности успешной стадии."""
+
+STAGE_WORKLOAD = {
+    'save_xml': ('feed_download_bytes_total',),
+    'get_images': ('feed_offers_scanned_total',),
+    'build': ('feed_offers_scanned_total',),
+    'execute': ('feed_offers_scanned_total',),
+    'add_frame': ('images_framed_total',),
+    'replace_images': (
+        'feed_pictures_added_total',
+        'feed_pictures_removed_total'
+    ),
+    'verify': ('images_verified_total',),
+}
+"""
+Метрики объема работы стадий для нормализации времени.
+
+Берутся метрики, которые растут при каждом запуске стадии, даже если
+скачивать и строить нечего: просмотренные офферы, проверенные
+изображения. Для счетчиков берется прирост значения по всем меткам,
+для гистограмм - прирост числа наблюдений. Стадии без записи
+нормализуются на один запуск.
+"""
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    command TEXT NOT NULL,
+    status TEXT NOT NULL,
+    execution_time REAL NOT NULL,
+    peak_rss_kb INTEGER,
+    cpu_user REAL,
+    cpu_system REAL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    workload REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stages_stage ON stages (stage, run_id);
+'''
+
+
+class RunHistory:
+    """
+    Класс локальной истории запусков в SQLite.
+
+    Для каждого запуска сохраняет итог из time_of_script, время
+    и объем работы каждой стадии, приросты счетчиков метрик
+    и потребление ресурсов. После записи сравнивает нормализованное
+    время стадий с медианой прошлых успешных запусков той же команды.
+    """
+
+    def __init__(
+        self,
+        state_folder: str = STATE_FOLDER,
+        db_name: str = HISTORY_DB
+    ) -> None:
+        folder_path = Path(__file__).parent.parent / state_folder
+        folder_path.mkdir(parents=True, exist_ok=True)
+        self.db_path = folder_path / db_name
+        self._previous = {'counters': {}, 'histograms': {}}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Защищенный метод, открывает базу и создает схему."""
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _deltas(self) -> tuple[dict, dict]:
+        """Защищенный метод, возвращает приросты метрик с прошлой записи."""
+        current = metrics.snapshot()
+        previous = self._previous
+        counters = {
+            name: value - previous['counters'].get(name, 0)
+            for name, value in current['counters'].items()
+        }
+        histograms = {}
+        for name, (count, total) in current['histograms'].items():
+            previous_count, previous_total = previous['histograms'].get(
+                name,
+                (0, 0.0)
+            )
+            histograms[name] = (count - previous_count, total - previous_total)
+        self._previous = current
+        return counters, histograms
+
+    @staticmethod
+    def _workload(stage: str, counters: dict, histograms: dict) -> float:
+        """
+        Защищенный метод, считает объем работы стадии.
+
+        Возвращает 0, если стадия ничего не обработала.
+        """
+        if stage not in STAGE_WORKLOAD:
+            return 1.0
+        workload = 0.0
+        for name in STAGE_WORKLOAD[stage]:
+            prefix = name + '{'
+            workload += sum(
+                value for key, value in counters.items()
+                if key == name or key.startswith(prefix)
+            )
+            workload += sum(
+                count for key, (count, _) in histograms.items()
+                if key == name or key.startswith(prefix)
+            )
+        return workload
+
+    def record(self, log_record: dict) -> int:
+        """Метод сохраняет запуск и проверяет стадии на регрессию."""
+        counters, histograms = self._deltas()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        stages = {}
+        for name, (count, total) in histograms.items():
+            if not name.startswith('stage_seconds{') or not count:
+                continue
+            if 'status="SUCCESS"' not in name:
+                continue
+            stage = name.split('"')[1]
+            stages[stage] = (
+                total,
+                self._workload(stage, counters, histograms)
+            )
+
+        with self._connect() as connection:
+            run_id = connection.execute(
+                'INSERT INTO runs (started_at, command, status, '
+                'execution_time, peak_rss_kb, cpu_user, cpu_system) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    time.time() - log_record['EXECUTION_TIME'],
+                    log_record['FUNCTION_NAME'],
+                    log_record['STATUS'],
+                    log_record['EXECUTION_TIME'],
+                    usage.ru_maxrss,
+                    usage.ru_utime,
+                    usage.ru_stime,
+                )
+            ).lastrowid
+            connection.executemany(
+                'INSERT INTO stages VALUES (?, ?, ?, ?)',
+                [
+                    (run_id, stage, seconds, workload)
+                    for stage, (seconds, workload) in stages.items()
+                ]
+            )
+            connection.executemany(
+                'INSERT INTO counters VALUES (?, ?, ?)',
+                [
+                    (run_id, name, value)
+                    for name, value in counters.items() if value
+                ]
+            )
+            if log_record['STATUS'] == 'SUCCESS':
+                self._check_regressions(
+                    connection,
+                    run_id,
+                    log_record['FUNCTION_NAME'],
+                    stages
+                )
+        connection.close()
+        return run_id
+
+    def _baseline(
+        self,
+        connection: sqlite3.Connection,
+        run_id: int,
+        command: str,
+        stage: str
+    ) -> float | None:
+        """Защищенный метод, считает медиану секунд на единицу работы."""
+        rows = connection.execute(
+            'SELECT stages.seconds / stages.workload FROM stages '
+            'JOIN runs ON runs.id = stages.run_id '
+            'WHERE stages.stage = ? AND runs.command = ? '
+            'AND runs.status = ? AND runs.id < ? AND stages.workload > 0 '
+            'ORDER BY runs.id DESC LIMIT ?',
+            (stage, command, 'SUCCESS', run_id, HISTORY_BASELINE_RUNS)
+        ).fetchall()
+        if len(rows) < 3:
+            return None
+        return statistics.median(row[0] for row in rows)
+
+    def _check_regressions(
+        self,
+        connection: sqlite3.Connection,
+        run_id: int,
+        command: str,
+        stages: dict
+    ) -> None:
+        """Защищенный метод, сообщает о стадиях медленнее базовой линии."""
+        for stage, (seconds, workload) in stages.items():
+            if seconds < HISTORY_MIN_SECONDS or not workload:
+                continue
+            baseline = self._baseline(connection, run_id, command, stage)
+            if not baseline:
+                continue
+            per_unit = seconds / workload
+            if per_unit > baseline * (1 + HISTORY_REGRESSION_MARGIN):
+                metrics.inc('performance_regressions_total', stage=stage)
+                logger.bot_event(
+                    'Регрессия производительности: стадия %s команды %s - '
+                    '%s сек. на единицу работы при базовой линии %s '
+                    '(x%s, объем работы %s)',
+                    stage,
+                    command,
+                    round(per_unit, 6),
+                    round(baseline, 6),
+                    round(per_unit / baseline, 2),
+                    int(workload)
+                )
+
+    def report(self, limit: int = 10, command: str | None = None) -> str:
+        """Метод формирует текстовый отчет о трендах стадий."""
+        lines = []
+        with self._connect() as connection:
+            query = (
+                'SELECT id, started_at, command, status, execution_time, '
+                'peak_rss_kb FROM runs '
+            )
+            params: tuple = ()
+            if command:
+                query += 'WHERE command = ? '
+                params = (command,)
+            runs = connection.execute(
+                query + 'ORDER BY id DESC LIMIT ?',
+                params + (limit,)
+            ).fetchall()
+            lines.append(f'Последние {len(runs)} запусков:')
+            for run_id, started_at, name, status, seconds, rss in runs:
+                started = time.strftime(
+                    '%Y-%m-%d %H:%M',
+                    time.localtime(started_at)
+                )
+                lines.append(
+                    f'  #{run_id} {started} {name} {status} '
+                    f'{round(seconds, 1)} сек., RSS {rss // 1024} МБ'
+                )
+            lines.append('Стадии (последний / медиана, сек. на единицу):')
+            stage_rows = connection.execute(
+                'SELECT stages.stage, stages.seconds / stages.workload '
+                'FROM stages JOIN runs ON runs.id = stages.run_id '
+                'WHERE runs.status = ? AND stages.workload > 0 '
+                'ORDER BY runs.id DESC',
+                ('SUCCESS',)
+            ).fetchall()
+        connection.close()
+        trends: dict[str, list[float]] = {}
+        for stage, per_unit in stage_rows:
+            values = trends.setdefault(stage, [])
+            if len(values) < limit:
+                values.append(per_unit)
+        for stage, values in sorted(trends.items()):
+            median = statistics.median(values)
+            ratio = round(values[0] / median, 2) if median else '-'
+            lines.append(
+                f'  {stage}: {round(values[0], 6)} / {round(median, 6)} '
+                f'(x{ratio}, запусков {len(values)})'
+            )
+        return '\n'.join(lines)
+
+
+_history: RunHistory | None = None
+
+
+def record_run(log_record: dict) -> None:
+    """
+    Функция, записывает итог запуска в историю.
+
+    Ошибки истории логируются и не влияют на результат запуска.
+    """
+    global _history
+    if not HISTORY_ENABLED:
+        return
+    try:
+        if _history is None:
+            _history = RunHistory()
+        _history.record(log_record)
+    except Exception as error:
+        logging.warning('Не удалось записать историю запуска: %s', error)
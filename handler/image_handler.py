@@ -1,21 +1,32 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
 
 import requests
 from PIL import Image
 
-from handler.constants import (FEEDS_FOLDER, FRAME_FOLDER, IMAGE_FOLDER,
-                               NAME_OF_FRAME, NEW_IMAGE_FOLDER,
-                               NUMBER_PIXELS_CANVAS, NUMBER_PIXELS_IMAGE,
+from handler.constants import (DOWNLOAD_WORKERS, FEEDS_FOLDER, FRAME_FOLDER,
+                               FRAME_WORKERS, IMAGE_FOLDER, IMAGE_PREFLIGHT,
+                               NEW_IMAGE_FOLDER, NUMBER_PIXELS_CANVAS,
+                               NUMBER_PIXELS_IMAGE, REQUEST_TIMEOUT,
                                RGB_COLOR_SETTINGS, RGBA_COLOR_SETTINGS)
 from handler.decorators import time_of_function
-from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
+from handler.exceptions import (DirectoryCreationError, EmptyFeedsListError,
+                                ImageTooLargeError)
+from handler.feed_index import (IndexedOffer, load_feed_index,
+                                selected_image_dict)
 from handler.feeds import FEEDS
-from handler.logging_config import setup_logging
+from handler.links import LinkChecker
+from handler.memory_budget import PixelBudget
+from handler.metrics import SIZE_BUCKETS, metrics
 from handler.mixins import FileMixin
+from handler.picture_rules import PictureRule, load_rules
+from handler.pools import SharedPool
+from handler.publisher import get_publisher
+from handler.variants import ImageVariant, default_variant
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -35,7 +46,18 @@ class FeedImage(FileMixin):
         new_image_folder: str = NEW_IMAGE_FOLDER,
         feeds_list: tuple[str, ...] = FEEDS,
         number_pixels_canvas: int = NUMBER_PIXELS_CANVAS,
-        number_pixels_image: int = NUMBER_PIXELS_IMAGE
+        number_pixels_image: int = NUMBER_PIXELS_IMAGE,
+        variants: tuple[ImageVariant, ...] | None = None,
+        budget: PixelBudget | None = None,
+        workers: int = FRAME_WORKERS,
+        session: requests.Session | None = None,
+        download_workers: int = DOWNLOAD_WORKERS,
+        download_pool: SharedPool | None = None,
+        render_pool: SharedPool | None = None,
+        owner: str = '',
+        rules: tuple[PictureRule, ...] | None = None,
+        links: LinkChecker | None = None,
+        preflight: bool = IMAGE_PREFLIGHT
     ) -> None:
         self.filenames = filenames
         self.images = images
@@ -46,8 +68,27 @@ class FeedImage(FileMixin):
         self.feeds_list = feeds_list
         self.number_pixels_canvas = number_pixels_canvas
         self.number_pixels_image = number_pixels_image
+        self.variants = variants or (
+            default_variant(
+                new_image_folder,
+                number_pixels_canvas,
+                number_pixels_image
+            ),
+        )
+        self.budget = budget or PixelBudget()
+        self.workers = workers
+        self.session = session or requests.Session()
+        self.download_workers = download_workers
+        self.download_pool = download_pool
+        self.render_pool = render_pool
+        self.owner = owner
+        self.rules = rules or load_rules()
+        self.links = links or LinkChecker(self.session)
+        self.preflight = preflight
         self._existing_image_offers: set[str] = set()
-        self._existing_framed_offers: set[str] = set()
+        self._originals_indexed = False
+        self._existing_framed_offers: dict[str, set[str]] = {}
+        self._frames: dict[str, Image.Image] = {}
 
     def _get_image_data(self, url: str) -> tuple:
         """
@@ -55,45 +96,310 @@ class FeedImage(FileMixin):
         и возвращает (image_data, image_format).
         """
         try:
-            response = requests.get(url)
+            with metrics.timer('image_download_seconds'):
+                response = self.session.get(url, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
+            metrics.inc('image_download_bytes_total', len(response.content))
+            metrics.observe(
+                'image_download_size_bytes',
+                len(response.content),
+                buckets=SIZE_BUCKETS
+            )
             image = Image.open(BytesIO(response.content))
             image_format = image.format.lower() if image.format else None
             return response.content, image_format
         except Exception as error:
+            metrics.inc('image_download_errors_total')
             logging.error('Ошибка при загрузке изображения %s: %s', url, error)
+            self.links.record_failure(url, error)
             return None, None
 
     def _get_image_filename(
         self,
-        index: int,
-        offer_id: str,
+        image_stem: str,
         image_data: bytes,
         image_format: str
     ) -> str:
         """Защищенный метод, создает имя файла с изображением."""
         if not image_data or not image_format:
             return ''
-        return f'{offer_id}_{index}.{image_format}'
+        return f'{image_stem}.{image_format}'
 
     def _save_image(
         self,
         image_data: bytes,
-        folder_path: Path,
         image_filename: str
-    ):
-        """Защищенный метод, сохраняет изображение по указанному пути."""
+    ) -> bool:
+        """
+        Защищенный метод, сохраняет изображение в директорию оригиналов.
+
+        Файл публикуется атомарно, его хеш попадает в манифест
+        для последующей проверки целостности.
+        """
         try:
             with Image.open(BytesIO(image_data)) as img:
-                file_path = folder_path / image_filename
-                img.load()
-                img.save(file_path)
+                width, height = img.size
+                self.budget.check(width, height)
+                buffer = BytesIO()
+                with self.budget.reserve(self.budget.estimate(width, height)):
+                    img.load()
+                    img.save(buffer, img.format)
+            get_publisher(self.image_folder).publish(
+                image_filename,
+                buffer.getvalue(),
+                kind='original'
+            )
+            return True
         except Exception as error:
             logging.error(
                 'Ошибка при сохранении %s: %s',
                 image_filename,
                 error
             )
+            return False
+
+    def load_image_index(self) -> None:
+        """
+        Метод строит кэш скачанных и обрамленных изображений.
+
+        Повторный вызов не перечитывает директории.
+        """
+        if not self._originals_indexed:
+            try:
+                self._build_set(
+                    self.image_folder,
+                    self._existing_image_offers
+                )
+            except (DirectoryCreationError, EmptyFeedsListError):
+                logging.warning(
+                    'Директория с изображениями отсутствует. Первый запуск'
+                )
+            self._originals_indexed = True
+        for variant in self.variants:
+            if variant.name in self._existing_framed_offers:
+                continue
+            existing = self._existing_framed_offers.setdefault(
+                variant.name, set()
+            )
+            try:
+                self._build_set(variant.folder, existing)
+            except (DirectoryCreationError, EmptyFeedsListError):
+                logging.warning(
+                    'Директория с форматированными изображениями %s '
+                    'отсутствует. Первый запуск',
+                    variant.folder
+                )
+
+    def reset_image_index(self) -> None:
+        """Метод сбрасывает кэш изображений для полного перечитывания."""
+        self._existing_image_offers.clear()
+        self._originals_indexed = False
+        self._existing_framed_offers.clear()
+
+    def discard_image(
+        self,
+        image_stem: str,
+        variant: ImageVariant | None = None
+    ) -> None:
+        """
+        Метод убирает изображение из кэша: оригинал или,
+        если передан вариант, обрамленное изображение варианта.
+
+        Следующий план заново скачает или построит изображение.
+        """
+        if variant is None:
+            self._existing_image_offers.discard(image_stem)
+            return
+        self._existing_framed_offers.get(variant.name, set()).discard(
+            image_stem
+        )
+
+    def framed_image_dict(
+        self,
+        variant: ImageVariant,
+        filenames: list[str] | None = None
+    ) -> dict:
+        """
+        Метод возвращает словарь '{offer_id}: [filenames]'
+        обрамленных изображений варианта из кэша
+        для офферов переданных фидов (по умолчанию всех).
+        """
+        files = {
+            image_stem: f'{image_stem}.{variant.extension}'
+            for image_stem in self._existing_framed_offers[variant.name]
+        }
+        offers = []
+        for filename in filenames or self.filenames:
+            offers.extend(
+                load_feed_index(self.feeds_folder, filename, self.rules)
+            )
+        return selected_image_dict(offers, files)
+
+    def has_original(self, image_stem: str) -> bool:
+        """Метод, проверяет наличие скачанного оригинала."""
+        return image_stem in self._existing_image_offers
+
+    def missing_variants(self, image_stem: str) -> list[ImageVariant]:
+        """Метод, возвращает варианты, которых нет для изображения."""
+        return [
+            variant for variant in self.variants
+            if image_stem not in self._existing_framed_offers[variant.name]
+        ]
+
+    def iter_offers(self):
+        """
+        Генератор пар (имя фида, запись индекса оффера) по всем фидам.
+
+        Офферы читаются из индекса, построенного при скачивании фида.
+        Каждый оффер учитывается в счетчике feed_offers_scanned_total.
+        """
+        for filename in self.filenames:
+            offers = load_feed_index(
+                self.feeds_folder,
+                filename,
+                self.rules
+            )
+            if not offers:
+                logging.debug('В файле %s не найдено offers', filename)
+                continue
+            for offer in offers:
+                metrics.inc('feed_offers_scanned_total')
+                yield filename, offer
+
+    def select_offer_images(
+        self,
+        offer: IndexedOffer
+    ) -> list[tuple[str, str]]:
+        """
+        Метод, возвращает отобранные правилами изображения оффера
+        парами (имя файла без расширения, ссылка).
+        """
+        return list(offer.selected)
+
+    def download_offer_images(
+        self,
+        offer_id: str,
+        offer_images: list[tuple[str, str]]
+    ) -> list[str]:
+        """
+        Метод скачивает недостающие изображения оффера.
+
+        Ссылки из кэша нерабочих не запрашиваются.
+        Возвращает имена сохраненных файлов.
+        """
+        saved_images = []
+        for potential_filename, offer_image in offer_images:
+            if potential_filename in self._existing_image_offers:
+                continue
+            if self.links.is_dead(offer_image):
+                metrics.inc('image_dead_links_skipped_total')
+                continue
+
+            image_data, image_format = self._get_image_data(offer_image)
+            if not image_data:
+                continue
+            image_filename = self._get_image_filename(
+                potential_filename,
+                image_data,
+                image_format
+            )
+            if not image_filename:
+                continue
+            if self._save_image(image_data, image_filename):
+                self._existing_image_offers.add(potential_filename)
+                saved_images.append(image_filename)
+        return saved_images
+
+    def _map(self, pool: SharedPool | None, workers: int, func, items):
+        """
+        Защищенный генератор результатов func по элементам.
+
+        Задачи выполняются в общем пуле с квотой владельца,
+        а без общего пула - в собственном пуле на workers потоков.
+        """
+        if pool is not None:
+            yield from pool.map(func, items, owner=self.owner)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(func, items)
+
+    def dead_links(self, offer_images: list[tuple[str, str]]) -> int:
+        """
+        Метод, считает нерабочие ссылки среди недостающих
+        изображений оффера.
+        """
+        return sum(
+            self.links.is_dead(offer_image)
+            for image_stem, offer_image in offer_images
+            if not self.has_original(image_stem)
+        )
+
+    def preflight_images(
+        self,
+        offers: list[tuple[str, list[tuple[str, str]]]]
+    ) -> int:
+        """
+        Метод параллельно проверяет ссылки недостающих изображений
+        офферов перед скачиванием, если включен режим проверки.
+
+        Принимает пары (offer_id, отобранные изображения),
+        возвращает число найденных нерабочих ссылок.
+        """
+        if not self.preflight:
+            return 0
+        urls = []
+        for _, offer_images in offers:
+            for image_stem, offer_image in offer_images:
+                if self.has_original(image_stem):
+                    continue
+                if not self.links.is_dead(offer_image):
+                    urls.append(offer_image)
+        return sum(
+            reason is not None for reason in self._map(
+                self.download_pool,
+                self.download_workers,
+                self.links.check,
+                list(dict.fromkeys(urls))
+            )
+        )
+
+    def download_images(
+        self,
+        offers: list[tuple[str, list[tuple[str, str]]]]
+    ) -> list[str]:
+        """
+        Метод скачивает изображения нескольких офферов параллельно.
+
+        Принимает пары (offer_id, отобранные изображения),
+        возвращает имена сохраненных файлов.
+        """
+        self.preflight_images(offers)
+        saved_images = []
+        for saved in self._map(
+            self.download_pool,
+            self.download_workers,
+            lambda offer: self.download_offer_images(*offer),
+            offers
+        ):
+            saved_images.extend(saved)
+        return saved_images
+
+    def log_dead_links(self, dead_links: dict[str, int]) -> None:
+        """
+        Метод сообщает число нерабочих ссылок по фидам.
+
+        Числа по всем фидам попадают в сводку метрик,
+        в лог - только ненулевые.
+        """
+        for filename, count in sorted(dead_links.items()):
+            metrics.set_gauge('feed_dead_links', count, feed=filename)
+            if not count:
+                continue
+            logger.bot_event(
+                'Нерабочих ссылок на изображения в фиде %s - %s',
+                filename,
+                count
+            )
 
     @time_of_function
     def get_images(self):
@@ -103,60 +409,37 @@ class FeedImage(FileMixin):
         images_downloaded = 0
         offers_skipped_existing = 0
 
-        try:
-            self._build_set(
-                self.image_folder,
-                self._existing_image_offers
-            )
-        except (DirectoryCreationError, EmptyFeedsListError):
-            logging.warning(
-                'Директория с изображениями отсутствует. Первый запуск'
-            )
-        try:
-            for filename in self.filenames:
-                root = self._get_root(filename, self.feeds_folder)
-                offers = root.findall('.//offer')
+        dead_links: dict[str, int] = {}
 
-                if not offers:
-                    logging.debug('В файле %s не найдено offers', filename)
+        self.load_image_index()
+        try:
+            offers = [
+                (
+                    filename,
+                    str(offer.get('id')),
+                    self.select_offer_images(offer)
+                )
+                for filename, offer in self.iter_offers()
+            ]
+            self.preflight_images([offer[1:] for offer in offers])
+            for filename, offer_id, offer_images in offers:
+                total_offers_processed += 1
+                if not offer_images:
                     continue
 
-                for offer in offers:
-                    offer_id = str(offer.get('id'))
-                    total_offers_processed += 1
-                    pictures = offer.findall('picture')
-                    if not pictures:
-                        logging.debug('В оффере %s нет изображений')
-                        continue
-                    offer_images = [
-                        img.text for img in pictures if (
-                            '1.jpg' in img.text or '2.jpg' in img.text
-                        ) and 'Technical' not in img.text
-                    ]
-                    if not offer_images:
-                        continue
-
-                    offers_with_images += 1
-
-                    for index, offer_image in enumerate(offer_images):
-                        potential_filename = f'{offer_id}_{index}'
-                        if potential_filename in self._existing_image_offers:
-                            offers_skipped_existing += 1
-                            continue
-
-                        image_data, image_format = self._get_image_data(
-                            offer_image
-                        )
-                        image_filename = self._get_image_filename(
-                            index,
-                            offer_id,
-                            image_data,
-                            image_format
-                        )
-                        folder_path = self._make_dir(self.image_folder)
-                        self._save_image(
-                            image_data, folder_path, image_filename)
-                        images_downloaded += 1
+                offers_with_images += 1
+                offers_skipped_existing += sum(
+                    self.has_original(image_stem)
+                    for image_stem, _ in offer_images
+                )
+                images_downloaded += len(
+                    self.download_offer_images(offer_id, offer_images)
+                )
+                dead_links[filename] = dead_links.get(
+                    filename,
+                    0
+                ) + self.dead_links(offer_images)
+            self.links.save()
             logger.bot_event(
                 'Всего обработано фидов - %s',
                 len(self.filenames)
@@ -177,104 +460,235 @@ class FeedImage(FileMixin):
                 'Пропущено офферов с уже скачанными изображениями - %s',
                 offers_skipped_existing
             )
+            self.log_dead_links(dead_links)
         except Exception as error:
             logging.error(
                 'Неожиданная ошибка при получении изображений: %s',
                 error
             )
 
-    @time_of_function
-    def add_frame(self):
-        """Метод форматирует изображения и добавляет рамку."""
-        file_path = self._make_dir(self.image_folder)
-        frame_path = self._make_dir(self.frame_folder)
-        new_file_path = self._make_dir(self.new_image_folder)
+    def _get_frame(self, frame_name: str) -> Image.Image:
+        """Защищенный метод, загружает рамку один раз на экземпляр."""
+        if frame_name not in self._frames:
+            frame_path = self._make_dir(self.frame_folder)
+            with Image.open(frame_path / frame_name) as frame:
+                frame.load()
+                self._frames[frame_name] = frame.convert('RGBA')
+        return self._frames[frame_name]
 
-        total_framed_images = 0
-        total_failed_images = 0
-        skipped_images = 0
+    def _render_variant(
+        self,
+        image: Image.Image,
+        variant: ImageVariant
+    ) -> Image.Image:
+        """
+        Защищенный метод, строит изображение с рамкой
+        для одного варианта из уже декодированного оригинала.
 
-        try:
-            self._build_set(
-                self.new_image_folder,
-                self._existing_framed_offers
-            )
-        except (DirectoryCreationError, EmptyFeedsListError):
-            logging.warning(
-                'Директория с форматированными изображениями отсутствует. '
-                'Первый запуск'
-            )
-        try:
-            frame = Image.open(frame_path / NAME_OF_FRAME)
-        except Exception as error:
-            logging.error('Не удалось загрузить рамку: %s', error)
-            return
-        try:
-            for image_name in self.images:
-                if image_name.split('.')[0] in self._existing_framed_offers:
-                    skipped_images += 1
-                    continue
-                try:
-                    with Image.open(file_path / image_name) as image:
-                        image.load()
-                        image_width, image_height = image.size
-                except Exception as error:
-                    total_failed_images += 1
-                    logging.error(
-                        'Ошибка загрузки изображения %s: %s',
-                        image_name,
-                        error
-                    )
-                    continue
+        Оригинал больше max_side уменьшается, меньший не увеличивается.
+        """
+        if variant.max_side and max(image.size) > variant.max_side:
+            scale = variant.max_side / max(image.size)
+            image = image.resize((
+                max(1, round(image.width * scale)),
+                max(1, round(image.height * scale))
+            ))
+        image_width, image_height = image.size
 
-                frame_resized = frame.resize((image_width, image_height))
+        frame_resized = self._get_frame(variant.frame).resize(
+            (image_width, image_height)
+        )
 
-                canvas_width = image_width - self.number_pixels_canvas
-                canvas_height = image_height - self.number_pixels_canvas
+        canvas_width = image_width - variant.number_pixels_canvas
+        canvas_height = image_height - variant.number_pixels_canvas
 
-                new_image_width = image_width - self.number_pixels_image
-                new_image_height = image_height - self.number_pixels_image
+        new_image_width = image_width - variant.number_pixels_image
+        new_image_height = image_height - variant.number_pixels_image
 
-                resized_image = image.resize(
-                    (new_image_width, new_image_height))
+        resized_image = image.resize((new_image_width, new_image_height))
 
-                canvas = Image.new(
-                    'RGB',
-                    (canvas_width, canvas_height),
-                    RGB_COLOR_SETTINGS
-                )
+        canvas = Image.new(
+            'RGB',
+            (canvas_width, canvas_height),
+            RGB_COLOR_SETTINGS
+        )
 
-                x_position = (canvas_width - new_image_width) // 2
-                y_position = (canvas_height - new_image_height) // 2
-                canvas.paste(resized_image, (x_position, y_position))
+        x_position = (canvas_width - new_image_width) // 2
+        y_position = (canvas_height - new_image_height) // 2
+        canvas.paste(resized_image, (x_position, y_position))
 
-                final_image = Image.new(
-                    'RGBA',
-                    (image_width, image_height),
-                    RGBA_COLOR_SETTINGS
-                )
+        final_image = Image.new(
+            'RGBA',
+            (image_width, image_height),
+            RGBA_COLOR_SETTINGS
+        )
+
+        canvas_x = (image_width - canvas_width) // 2
+        canvas_y = (image_height - canvas_height) // 2
+
+        final_image.paste(canvas, (canvas_x, canvas_y))
+        final_image.paste(frame_resized, (0, 0), frame_resized)
 
-                canvas_x = (image_width - canvas_width) // 2
-                canvas_y = (image_height - canvas_height) // 2
+        if variant.has_alpha:
+            return final_image
+        background = Image.new(
+            'RGB',
+            (image_width, image_height),
+            RGB_COLOR_SETTINGS
+        )
+        background.paste(final_image, (0, 0), final_image)
+        return background
 
-                final_image.paste(canvas, (canvas_x, canvas_y))
-                final_image.paste(frame_resized, (0, 0), frame_resized)
-                final_image.save(
-                    new_file_path / f'{image_name.split('.')[0]}.png',
-                    'PNG'
+    def _frame_image(
+        self,
+        image_name: str,
+        file_path: Path
+    ) -> tuple[str, int]:
+        """
+        Защищенный метод, строит недостающие варианты одного изображения.
+
+        Варианты публикуются только при изменении содержимого.
+        Возвращает статус обработки и количество построенных вариантов.
+        """
+        image_stem = image_name.split('.')[0]
+        pending_variants = self.missing_variants(image_stem)
+        if not pending_variants:
+            return 'skipped', 0
+        try:
+            width, height = self.budget.probe(file_path / image_name)
+            self.budget.check(width, height)
+        except ImageTooLargeError as error:
+            logging.error('Изображение %s отклонено: %s', image_name, error)
+            return 'rejected', 0
+        except Exception as error:
+            logging.error(
+                'Ошибка чтения заголовка изображения %s: %s',
+                image_name,
+                error
+            )
+            return 'failed', 0
+
+        framed = 0
+        with self.budget.reserve(
+            self.budget.estimate(width, height, pending_variants)
+        ):
+            try:
+                with Image.open(file_path / image_name) as image:
+                    with metrics.timer('image_decode_seconds'):
+                        image.load()
+                    for variant in pending_variants:
+                        with metrics.timer(
+                            'image_render_seconds',
+                            variant=variant.name
+                        ):
+                            final_image = self._render_variant(
+                                image,
+                                variant
+                            )
+                        buffer = BytesIO()
+                        with metrics.timer(
+                            'image_encode_seconds',
+                            variant=variant.name
+                        ):
+                            final_image.save(
+                                buffer,
+                                variant.image_format,
+                                **variant.save_params()
+                            )
+                        get_publisher(variant.folder).publish(
+                            f'{image_stem}.{variant.extension}',
+                            buffer.getvalue(),
+                            kind='image'
+                        )
+                        self._existing_framed_offers[variant.name].add(
+                            image_stem
+                        )
+                        framed += 1
+            except Exception as error:
+                logging.error(
+                    'Ошибка обработки изображения %s: %s',
+                    image_name,
+                    error
                 )
-                total_framed_images += 1
+                return 'failed', framed
+        return 'framed', framed
+
+    def frame_images(self, image_names: list[str]) -> dict[str, int]:
+        """
+        Метод строит недостающие варианты для переданных изображений.
+
+        Каждый оригинал декодируется один раз, после чего из него
+        строятся все недостающие варианты. Изображения допускаются
+        в обработку через бюджет пикселей, поэтому число потоков
+        не влияет на пиковое потребление памяти. При общем пуле
+        магазин занимает не больше своей квоты потоков. Возвращает счетчики
+        статусов и число сохраненных вариантов ('variants').
+        """
+        file_path = self._make_dir(self.image_folder)
+        for variant in self.variants:
+            self._make_dir(variant.folder)
+            self._get_frame(variant.frame)
+
+        statuses = {
+            'framed': 0,
+            'skipped': 0,
+            'failed': 0,
+            'rejected': 0,
+            'variants': 0
+        }
+        submitted = time.monotonic()
+
+        def process(image_name: str) -> tuple[str, int]:
+            metrics.observe(
+                'image_queue_wait_seconds',
+                time.monotonic() - submitted
+            )
+            return self._frame_image(image_name, file_path)
+
+        for status, framed in self._map(
+            self.render_pool,
+            self.workers,
+            process,
+            image_names
+        ):
+            statuses[status] += 1
+            statuses['variants'] += framed
+            metrics.inc('images_framed_total', status=status)
+        metrics.inc('image_variants_saved_total', statuses['variants'])
+        metrics.set_gauge('pixel_budget_peak', self.budget.peak)
+        return statuses
+
+    @time_of_function
+    def add_frame(self):
+        """Метод форматирует изображения и добавляет рамку."""
+        self.load_image_index()
+        try:
+            for variant in self.variants:
+                self._get_frame(variant.frame)
+        except Exception as error:
+            logging.error('Не удалось загрузить рамку: %s', error)
+            return
+        try:
+            statuses = self.frame_images(self.images)
             logger.bot_event(
                 'Количество изображений, к которым добавлена рамка - %s',
-                total_framed_images
+                statuses['variants']
             )
             logger.bot_event(
                 'Количество уже обрамленных изображений - %s',
-                skipped_images
+                statuses['skipped']
             )
             logger.bot_event(
                 'Количество изображений обрамленных неудачно - %s',
-                total_failed_images
+                statuses['failed']
+            )
+            logger.bot_event(
+                'Количество изображений, отклоненных по лимиту пикселей - %s',
+                statuses['rejected']
+            )
+            logging.info(
+                'Пиковый бюджет пикселей при наложении рамки - %s',
+                self.budget.peak
             )
         except Exception as error:
             logging.error('Неожиданная ошибка наложения рамки: %s', error)
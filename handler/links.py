@@ -0,0 +1,176 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+import requests
+from PIL import UnidentifiedImageError
+
+from handler.constants import (DEAD_LINK_TTL, DEAD_LINKS_FILE, MAX_IMAGE_BYTES,
+                               PREFLIGHT_RANGE_BYTES, REQUEST_TIMEOUT,
+                               STATE_FOLDER)
+from handler.metrics import metrics
+from handler.publisher import atomic_write
+
+TRANSIENT_STATUSES = (408, 425, 429)
+"""Коды ответа 4xx, после которых ссылку стоит запросить повторно."""
+
+BINARY_CONTENT_TYPES = ('application/octet-stream', 'binary/octet-stream')
+"""Типы содержимого, под которыми поставщики отдают изображения."""
+
+
+class LinkChecker:
+    """
+    Класс проверки ссылок на изображения поставщика.
+
+    Перед полным скачиванием запрашивает ссылку методом HEAD
+    и проверяет код ответа, тип и размер содержимого. Ответ HEAD
+    с ошибкой 4xx или 501 перепроверяется частичным GET: многие
+    CDN и подписанные ссылки отклоняют HEAD, но отдают файл по GET.
+    Нерабочие ссылки хранятся в кэше в директории состояния
+    и не запрашиваются ttl секунд. Временные ошибки сервера
+    и сети в кэш не попадают.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session | None = None,
+        state_folder: str = STATE_FOLDER,
+        ttl: int = DEAD_LINK_TTL,
+        max_bytes: int = MAX_IMAGE_BYTES
+    ) -> None:
+        self.session = session or requests.Session()
+        self.file_path = (
+            Path(__file__).parent.parent / state_folder / DEAD_LINKS_FILE
+        )
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dead = self._load()
+        self._dirty = False
+
+    def _load(self) -> dict[str, list]:
+        """Защищенный метод, читает кэш без просроченных записей."""
+        if not self.file_path.exists():
+            return {}
+        try:
+            with open(self.file_path, encoding='utf-8') as file:
+                dead = json.load(file)
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning(
+                'Не удалось прочитать кэш нерабочих ссылок: %s',
+                error
+            )
+            return {}
+        deadline = time.time() - self.ttl
+        return {
+            url: entry for url, entry in dead.items() if entry[0] > deadline
+        }
+
+    def save(self) -> None:
+        """Метод сохраняет кэш, если он изменился."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._dead, ensure_ascii=False).encode()
+            self._dirty = False
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.file_path, data)
+
+    def is_dead(self, url: str) -> bool:
+        """Метод, проверяет, известна ли ссылка как нерабочая."""
+        with self._lock:
+            entry = self._dead.get(url)
+        return bool(entry) and entry[0] > time.time() - self.ttl
+
+    def mark_dead(self, url: str, reason: str) -> None:
+        """Метод заносит ссылку в кэш нерабочих."""
+        with self._lock:
+            self._dead[url] = [time.time(), reason]
+            self._dirty = True
+        metrics.inc('image_dead_links_total', reason=reason)
+        logging.info('Нерабочая ссылка %s: %s', url, reason)
+
+    def record_failure(self, url: str, error: Exception) -> None:
+        """
+        Метод заносит ссылку в кэш по ошибке полного скачивания,
+        если ошибка не временная.
+        """
+        if isinstance(error, UnidentifiedImageError):
+            self.mark_dead(url, 'not_image')
+        elif isinstance(error, requests.HTTPError) and (
+            error.response is not None
+        ):
+            reason = self._status_reason(error.response.status_code)
+            if reason:
+                self.mark_dead(url, reason)
+
+    @staticmethod
+    def _status_reason(status_code: int) -> str | None:
+        """Защищенный метод, возвращает причину по коду ответа."""
+        if 400 <= status_code < 500 and (
+            status_code not in TRANSIENT_STATUSES
+        ):
+            return f'http_{status_code}'
+        return None
+
+    def _classify(self, response: requests.Response) -> str | None:
+        """Защищенный метод, возвращает причину отказа по ответу."""
+        reason = self._status_reason(response.status_code)
+        if reason or not response.ok:
+            return reason
+        content_type = response.headers.get('Content-Type', '')
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type and not content_type.startswith('image/') and (
+            content_type not in BINARY_CONTENT_TYPES
+        ):
+            return 'content_type'
+        size = response.headers.get('Content-Length')
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code == 206 and '/' in content_range:
+            size = content_range.rsplit('/', 1)[1]
+        if size is None or not size.isdigit():
+            return None
+        if int(size) == 0:
+            return 'empty'
+        if int(size) > self.max_bytes:
+            return 'too_large'
+        return None
+
+    def check(self, url: str) -> str | None:
+        """
+        Метод проверяет ссылку запросом HEAD и, при ошибке
+        4xx или 501, частичным GET.
+
+        Нерабочая ссылка заносится в кэш. Возвращает причину
+        или None, если ссылку стоит скачивать.
+        """
+        try:
+            response = self.session.head(
+                url,
+                timeout=REQUEST_TIMEOUT,
+                allow_redirects=True
+            )
+            if 400 <= response.status_code < 500 or (
+                response.status_code == 501
+            ):
+                response = self.session.get(
+                    url,
+                    headers={'Range': f'bytes=0-{PREFLIGHT_RANGE_BYTES - 1}'},
+                    timeout=REQUEST_TIMEOUT,
+                    stream=True
+                )
+                response.close()
+        except requests.RequestException as error:
+            metrics.inc('image_preflight_total', result='error')
+            logging.debug('Ссылка %s не проверена: %s', url, error)
+            return None
+        reason = self._classify(response)
+        metrics.inc(
+            'image_preflight_total',
+            result='dead' if reason else 'ok'
+        )
+        if reason:
+            self.mark_dead(url, reason)
+        return reason
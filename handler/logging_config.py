@@ -1,7 +1,13 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
 from datetime import datetime as dt
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from handler.constants import LOG_FORMAT, LOG_LEVEL
 
 INFO_BOT = 25
 
@@ -16,6 +22,55 @@ class CustomLogger(logging.Logger):
 
 logging.setLoggerClass(CustomLogger)
 
+_configured = False
+
+
+def get_log_dir() -> str:
+    """Функция, возвращает и создает датированную директорию логов."""
+    date_dir = dt.now().strftime('%Y-%m-%d')
+    log_dir = os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'logs', date_dir)
+    )
+    os.makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматтер записей лога в одну JSON-строку."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record),
+            'file': record.filename,
+            'function': record.funcName,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    Обработчик записи в очередь внутри процесса.
+
+    В вызывающем потоке в сообщение только подставляются аргументы.
+    Исключение остается в записи, и его вместе со строкой целиком
+    форматирует обработчик фонового потока: в JSON оно попадает
+    в поле exception, в тексте - после всей строки.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Метод подставляет аргументы в копию записи."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
 
 def setup_logging():
     """
@@ -25,19 +80,23 @@ def setup_logging():
     - Ротацию логов (макс. 50MB на файл, хранит до 3 бэкапов).
     - UTF-8 кодировку логов.
     - Формат записей: время, имя файла, функция, уровень,
-    сообщение, имя логгера.
+    сообщение, имя логгера. При LOG_FORMAT=json - JSON-строка.
     - Кастомный уровень логирования INFO_BOT (помечать им сообщения,
     которые хотим видеть в деталях сообщений по отработке скриптов)
-    - Уровень логирования: INFO.
+    - Уровень логирования: LOG_LEVEL, по умолчанию INFO.
+
+    Логгеры пишут записи в очередь, файл пишет один фоновый
+    поток QueueListener, поэтому вызов логирования не ждет диска.
 
     Логи сохраняются в папку 'logs' с именем файла в формате ГГГГ-ММ-ДД.log.
     Автоматически создает папку логов, если она не существует.
+    Повторные вызовы ничего не делают.
     """
-    date_dir = dt.now().strftime('%Y-%m-%d')
-    log_dir = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), '..', 'logs', date_dir)
-    )
-    os.makedirs(log_dir, exist_ok=True)
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    log_dir = get_log_dir()
     log_id = dt.now().strftime('%Y%m%d%H%M')
     log_filename = f'{log_id}.log'
     log_filepath = os.path.join(log_dir, log_filename)
@@ -49,17 +108,25 @@ def setup_logging():
         encoding='utf-8'
     )
 
-    handler.setLevel(logging.INFO)
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format=(
+    handler.setLevel(LOG_LEVEL)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
             '%(asctime)s, '
             '%(filename)s, '
             '%(funcName)s, '
             '%(levelname)s, '
             '%(message)s, '
             '%(name)s'
-        ),
-        handlers=[handler]
+        ))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        handlers=[LocalQueueHandler(log_queue)]
     )
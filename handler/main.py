@@ -1,52 +1,287 @@
+import argparse
 import logging
+import sys
 
-from handler.constants import FEEDS_FOLDER, IMAGE_FOLDER
+from handler.constants import (FEEDS_FOLDER, IMAGE_FOLDER, RUN_TIME_BUDGET,
+                               SHOPS_CONFIG, VERIFY_SAMPLE_SIZE)
 from handler.decorators import time_of_function, time_of_script
-from handler.feeds_handler import FeedHandler
-from handler.feeds_save import FeedSaver
-from handler.image_handler import FeedImage
+from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
 from handler.logging_config import setup_logging
 from handler.utils import get_filenames_list
+from handler.variants import load_variants
 
-setup_logging()
+# Модули стадий импортируются внутри команд: стадии без изображений
+# не загружают PIL, стадии без сети не загружают requests.
 
 
-@time_of_script
-@time_of_function
-def main():
-    try:
-        save_client = FeedSaver()
-        save_client.save_xml()
+def _get_feed_filenames() -> list[str]:
+    """Функция, возвращает список скачанных фидов или падает с ошибкой."""
+    filenames = get_filenames_list(FEEDS_FOLDER)
+    if not filenames:
+        logging.error('Директория %s пуста', FEEDS_FOLDER)
+        raise FileNotFoundError(
+            f'Директория {FEEDS_FOLDER} не содержит файлов'
+        )
+    return filenames
+
 
+def _migrate_image_stems(variants) -> None:
+    """
+    Функция, переименовывает изображения с позиционными именами
+    в имена по правилам отбора, если это еще не сделано.
+    """
+    from handler.migrations import StemMigrator
+
+    try:
         filenames = get_filenames_list(FEEDS_FOLDER)
+    except (DirectoryCreationError, EmptyFeedsListError):
+        return
+    StemMigrator(filenames, variants).migrate()
 
-        if not filenames:
-            logging.error('Директория %s пуста', FEEDS_FOLDER)
-            raise FileNotFoundError(
-                f'Директория {FEEDS_FOLDER} не содержит файлов'
-            )
 
-        image_client = FeedImage(filenames, images=[])
-        image_client.get_images()
-        images = get_filenames_list(IMAGE_FOLDER)
+@time_of_script
+def fetch_feeds(args: argparse.Namespace) -> None:
+    """Стадия скачивания фидов."""
+    from handler.feeds_save import FeedSaver
 
-        if not images:
-            logging.error('Директория %s пуста', IMAGE_FOLDER)
-            raise FileNotFoundError(
-                f'Директория {IMAGE_FOLDER} не содержит файлов'
-            )
+    FeedSaver().save_xml()
+
+
+@time_of_script
+def fetch_images(args: argparse.Namespace) -> None:
+    """Стадия скачивания изображений по скачанным фидам."""
+    from handler.image_handler import FeedImage
+
+    variants = load_variants()
+    _migrate_image_stems(variants)
+    FeedImage(
+        _get_feed_filenames(),
+        images=[],
+        variants=variants
+    ).get_images()
+
+
+@time_of_script
+def frame(args: argparse.Namespace) -> None:
+    """Стадия наложения рамки на скачанные изображения."""
+    from handler.image_handler import FeedImage
+
+    variants = load_variants()
+    _migrate_image_stems(variants)
+    FeedImage(
+        [],
+        images=get_filenames_list(IMAGE_FOLDER),
+        variants=variants
+    ).add_frame()
 
-        image_client.images = images
-        image_client.add_frame()
 
+@time_of_script
+def rewrite(args: argparse.Namespace) -> None:
+    """Стадия перезаписи фидов ссылками на обрамленные изображения."""
+    from handler.feeds_handler import FeedHandler
+
+    filenames = _get_feed_filenames()
+    variants = load_variants()
+    _migrate_image_stems(variants)
+    for variant in variants:
         for filename in filenames:
-            handler_client = FeedHandler(filename)
-            handler_client.replace_images().save()
+            handler_client = FeedHandler(
+                filename,
+                new_image_folder=variant.folder,
+                address_ftp_images=variant.url_prefix
+            )
+            handler_client.replace_images().save(prefix=variant.feed_prefix)
+
+
+@time_of_script
+def prune(args: argparse.Namespace) -> None:
+    """Стадия удаления изображений, на которые не ссылаются фиды."""
+    from handler.prune import ImagePruner
+
+    variants = load_variants()
+    if not args.dry_run:
+        _migrate_image_stems(variants)
+    ImagePruner(
+        _get_feed_filenames(),
+        variants
+    ).prune(dry_run=args.dry_run)
+
+
+@time_of_script
+def verify(args: argparse.Namespace) -> None:
+    """Стадия проверки целостности скачанных и обрамленных изображений."""
+    from handler.image_handler import FeedImage
+    from handler.verify import ImageVerifier
+
+    ImageVerifier(
+        FeedImage([], images=[], variants=load_variants()),
+        sample_size=args.sample
+    ).verify(full=args.full, dry_run=args.dry_run)
+
+
+@time_of_script
+@time_of_function
+def run_all(args: argparse.Namespace) -> None:
+    """Полный запуск: скачивание фидов и выполнение плана работ."""
+    from handler.feeds_save import FeedSaver
+    from handler.image_handler import FeedImage
+    from handler.planner import RunPlanner
+    from handler.verify import ImageVerifier
+
+    try:
+        variants = load_variants()
+        if not args.dry_run:
+            FeedSaver().save_xml()
+            _migrate_image_stems(variants)
+
+        image_client = FeedImage(
+            _get_feed_filenames(),
+            images=[],
+            variants=variants
+        )
+        ImageVerifier(image_client).verify(dry_run=args.dry_run)
+        planner = RunPlanner(image_client, variants, args.time_budget)
+        plan = planner.build()
+
+        if args.dry_run:
+            planner.print_plan(plan)
+            return
+
+        planner.execute(plan)
 
     except Exception as error:
         logging.error('Неожиданная ошибка: %s', error)
         raise
 
 
+@time_of_script
+def run_shops(args: argparse.Namespace) -> None:
+    """Полный запуск всех магазинов из конфигурации в одном процессе."""
+    from handler.shop_runner import MultiShopRunner
+    from handler.shops import load_shops
+
+    MultiShopRunner(
+        load_shops(args.config),
+        time_budget=args.time_budget
+    ).run()
+
+
+def history(args: argparse.Namespace) -> None:
+    """Отчет о трендах времени стадий по истории запусков."""
+    from handler.history import RunHistory
+
+    print(RunHistory().report(limit=args.limit, command=args.run_command))
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Резидентный режим с циклами по расписанию."""
+    from handler.daemon import FeedDaemon
+
+    FeedDaemon(time_budget=args.time_budget).serve_forever()
+
+
+COMMANDS = {
+    'fetch-feeds': fetch_feeds,
+    'fetch-images': fetch_images,
+    'frame': frame,
+    'rewrite': rewrite,
+    'prune': prune,
+    'verify': verify,
+    'all': run_all,
+    'serve': serve,
+    'shops': run_shops,
+    'history': history,
+}
+"""Соответствие подкоманд функциям стадий."""
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Функция, разбирает аргументы командной строки.
+
+    Без подкоманды выполняется all, и ее аргументы, например
+    --dry-run и --time-budget, передаются без имени подкоманды.
+    """
+    parser = argparse.ArgumentParser(description='Обработка фидов uvi.')
+    subparsers = parser.add_subparsers(dest='command')
+    for command in ('fetch-feeds', 'fetch-images', 'frame', 'rewrite'):
+        subparsers.add_parser(command, help=COMMANDS[command].__doc__)
+
+    prune_parser = subparsers.add_parser('prune', help=prune.__doc__)
+    prune_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Только посчитать изображения к удалению.'
+    )
+
+    verify_parser = subparsers.add_parser('verify', help=verify.__doc__)
+    verify_parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Проверить все изображения, а не очередную выборку.'
+    )
+    verify_parser.add_argument(
+        '--sample',
+        type=int,
+        default=VERIFY_SAMPLE_SIZE,
+        help='Число проверяемых файлов каждой директории в выборке.'
+    )
+    verify_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Только найти испорченные изображения, ничего не удаляя.'
+    )
+
+    for command in ('all', 'serve', 'shops'):
+        command_parser = subparsers.add_parser(
+            command,
+            help=COMMANDS[command].__doc__
+        )
+        command_parser.add_argument(
+            '--time-budget',
+            type=int,
+            default=RUN_TIME_BUDGET,
+            help='Бюджет времени запуска в секундах, 0 - без ограничения.'
+        )
+    subparsers.choices['shops'].add_argument(
+        '--config',
+        default=SHOPS_CONFIG,
+        help='Путь к JSON-файлу со списком магазинов.'
+    )
+    history_parser = subparsers.add_parser('history', help=history.__doc__)
+    history_parser.add_argument(
+        '--limit',
+        type=int,
+        default=10,
+        help='Количество последних запусков в отчете.'
+    )
+    history_parser.add_argument(
+        '--command',
+        dest='run_command',
+        default=None,
+        help='Показать запуски только этой команды, например run_all.'
+    )
+
+    subparsers.choices['all'].add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Вывести план по скачанным фидам с оценкой стоимости и выйти.'
+    )
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (
+        argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')
+    ):
+        argv.insert(0, 'all')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    """Точка входа командной строки."""
+    args = parse_args(argv)
+    setup_logging()
+    COMMANDS[args.command](args)
+
+
 if __name__ == '__main__':
     main()
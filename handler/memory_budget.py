@@ -0,0 +1,91 @@
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from PIL import Image
+
+from handler.constants import (MAX_IMAGE_PIXELS, PIXEL_BUDGET,
+                               RENDER_PIXEL_FACTOR)
+from handler.exceptions import ImageTooLargeError
+from handler.metrics import metrics
+
+
+class PixelBudget:
+    """
+    Планировщик, допускающий изображения в обработку по бюджету пикселей.
+
+    Размер изображения берется из заголовка файла без декодирования.
+    Изображения больше max_image_pixels отклоняются сразу, остальные
+    ждут, пока суммарное число резидентных декодированных пикселей
+    всех потоков не опустится ниже total_pixels. Изображение, которое
+    одно превышает бюджет, допускается только при пустом бюджете.
+    """
+
+    def __init__(
+        self,
+        total_pixels: int = PIXEL_BUDGET,
+        max_image_pixels: int = MAX_IMAGE_PIXELS,
+        render_factor: int = RENDER_PIXEL_FACTOR
+    ) -> None:
+        self.total_pixels = total_pixels
+        self.max_image_pixels = max_image_pixels
+        self.render_factor = render_factor
+        self.in_use = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def probe(self, file_path: Path) -> tuple[int, int]:
+        """Метод, читает размеры изображения из заголовка файла."""
+        with Image.open(file_path) as image:
+            return image.size
+
+    def check(self, width: int, height: int) -> None:
+        """Метод, проверяет изображение на лимит пикселей."""
+        pixels = width * height
+        if pixels > self.max_image_pixels:
+            raise ImageTooLargeError(
+                f'Размер {width}x{height} ({pixels} пикс.) '
+                f'превышает лимит {self.max_image_pixels} пикс.'
+            )
+
+    def estimate(self, width: int, height: int, variants=()) -> int:
+        """
+        Метод, оценивает пиковое число пикселей обработки изображения.
+
+        Учитывается декодированный оригинал и самый тяжелый вариант:
+        уменьшенная копия, рамка, холст и итоговое изображение.
+        Изображения не больше max_side строятся без масштабирования.
+        """
+        pixels = width * height
+        variant_costs = [0]
+        for variant in variants:
+            if variant.max_side and max(width, height) > variant.max_side:
+                scale = variant.max_side / max(width, height)
+                scaled_pixels = round(pixels * scale * scale)
+                variant_costs.append(
+                    scaled_pixels * (self.render_factor + 1)
+                )
+            else:
+                variant_costs.append(pixels * self.render_factor)
+        return pixels + max(variant_costs)
+
+    @contextmanager
+    def reserve(self, pixels: int):
+        """Контекстный менеджер, резервирующий пиксели в бюджете."""
+        start_time = time.monotonic()
+        with self._condition:
+            while self.in_use and self.in_use + pixels > self.total_pixels:
+                self._condition.wait()
+            self.in_use += pixels
+            self.peak = max(self.peak, self.in_use)
+        metrics.observe(
+            'pixel_budget_wait_seconds',
+            time.monotonic() - start_time
+        )
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_use -= pixels
+                self._condition.notify_all()
@@ -0,0 +1,306 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from handler.constants import METRICS_ENABLED, METRICS_FOLDER, METRICS_PREFIX
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300
+)
+"""Границы гистограмм длительности в секундах."""
+
+SIZE_BUCKETS = (
+    1024, 10240, 102400, 262144, 524288, 1048576, 5242880, 20971520
+)
+"""Границы гистограмм размера в байтах."""
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Метод добавляет наблюдение."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def since(self, counts: list, count: int, total: float) -> 'Histogram':
+        """
+        Метод возвращает гистограмму наблюдений, добавленных
+        после снимка (counts, count, total).
+        """
+        delta = Histogram(self.buckets)
+        delta.counts = [
+            current - previous
+            for current, previous in zip(self.counts, counts)
+        ]
+        delta.count = self.count - count
+        delta.sum = self.sum - total
+        return delta
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Метод оценивает квантиль по верхней границе корзины.
+
+        Для значений выше последней границы возвращает float('inf').
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """
+    Реестр счетчиков, измерителей и гистограмм процесса.
+
+    Метрики идентифицируются именем и набором меток. Запись защищена
+    одной блокировкой и сводится к поиску в словаре, поэтому реестр
+    можно держать включенным постоянно. Значения копятся за все время
+    процесса и так попадают в textfile Prometheus, а JSON-сводка
+    содержит только прирост с последнего вызова start_run.
+    """
+
+    def __init__(
+        self,
+        prefix: str = METRICS_PREFIX,
+        enabled: bool = METRICS_ENABLED
+    ) -> None:
+        self.prefix = prefix
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._counters: dict = {}
+        self._gauges: dict = {}
+        self._histograms: dict = {}
+        self._run_counters: dict = {}
+        self._run_histograms: dict = {}
+        self._lock = threading.Lock()
+
+    def start_run(self) -> None:
+        """
+        Метод отмечает начало запуска для JSON-сводки.
+
+        В резидентном режиме вызывается в начале каждого цикла,
+        чтобы сводка не суммировала циклы с момента старта процесса.
+        """
+        with self._lock:
+            self.started_at = time.time()
+            self._run_counters = dict(self._counters)
+            self._run_histograms = {
+                key: (list(histogram.counts), histogram.count, histogram.sum)
+                for key, histogram in self._histograms.items()
+            }
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Метод увеличивает счетчик."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Метод устанавливает значение измерителя."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: tuple = LATENCY_BUCKETS,
+        **labels
+    ) -> None:
+        """Метод добавляет наблюдение в гистограмму."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Контекстный менеджер, замеряющий длительность блока."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, **labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Метод возвращает текущее значение счетчика."""
+        return self._counters.get(self._key(name, labels), 0)
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+        pairs = [
+            f'{key}="{str(value).replace(chr(34), chr(39))}"'
+            for key, value in labels + extra
+        ]
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _flat(self, name: str, labels: tuple) -> str:
+        """Защищенный метод, возвращает имя метрики с метками."""
+        return name + self._format_labels(labels)
+
+    def snapshot(self) -> dict:
+        """
+        Метод возвращает текущие значения счетчиков и сумм гистограмм.
+
+        Используется для подсчета разницы между двумя моментами,
+        например между циклами резидентного режима.
+        """
+        with self._lock:
+            return {
+                'counters': {
+                    self._flat(*key): value
+                    for key, value in self._counters.items()
+                },
+                'histograms': {
+                    self._flat(*key): (histogram.count, histogram.sum)
+                    for key, histogram in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Метод формирует текст в формате Prometheus textfile."""
+        lines = []
+        with self._lock:
+            for kind, values in (
+                ('counter', self._counters),
+                ('gauge', self._gauges)
+            ):
+                typed = set()
+                for (name, labels), value in sorted(values.items()):
+                    full_name = f'{self.prefix}_{name}'
+                    if full_name not in typed:
+                        lines.append(f'# TYPE {full_name} {kind}')
+                        typed.add(full_name)
+                    lines.append(
+                        f'{full_name}{self._format_labels(labels)} {value}'
+                    )
+            typed = set()
+            for (name, labels), histogram in sorted(
+                self._histograms.items()
+            ):
+                full_name = f'{self.prefix}_{name}'
+                if full_name not in typed:
+                    lines.append(f'# TYPE {full_name} histogram')
+                    typed.add(full_name)
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    histogram.buckets + ('+Inf',),
+                    histogram.counts
+                ):
+                    cumulative += bucket_count
+                    bucket_labels = self._format_labels(
+                        labels,
+                        (('le', bound),)
+                    )
+                    lines.append(
+                        f'{full_name}_bucket{bucket_labels} {cumulative}'
+                    )
+                label_text = self._format_labels(labels)
+                lines.append(f'{full_name}_sum{label_text} {histogram.sum}')
+                lines.append(
+                    f'{full_name}_count{label_text} {histogram.count}'
+                )
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> dict:
+        """
+        Метод формирует сводку запуска для JSON.
+
+        Счетчики и гистограммы берутся приростом с начала запуска,
+        метрики без прироста пропускаются. Измерители берутся
+        текущими значениями.
+        """
+        flat = self._flat
+        with self._lock:
+            counters = {}
+            for key, value in sorted(self._counters.items()):
+                value -= self._run_counters.get(key, 0)
+                if value:
+                    counters[flat(*key)] = value
+            histograms = {}
+            for key, histogram in sorted(self._histograms.items()):
+                previous = self._run_histograms.get(key)
+                if previous:
+                    histogram = histogram.since(*previous)
+                if not histogram.count:
+                    continue
+                histograms[flat(*key)] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                    'p99': histogram.quantile(0.99),
+                }
+            return {
+                'started_at': self.started_at,
+                'finished_at': time.time(),
+                'counters': counters,
+                'gauges': {
+                    flat(*key): value
+                    for key, value in sorted(self._gauges.items())
+                },
+                'histograms': histograms,
+            }
+
+    def export(self, folder: str = METRICS_FOLDER) -> None:
+        """
+        Метод записывает textfile Prometheus и JSON-сводку.
+
+        Файлы пишутся через временный файл и переименование,
+        чтобы сборщик не прочитал их наполовину. Бесконечные квантили
+        записываются в JSON строкой '+Inf', как в формате Prometheus.
+        """
+        if not self.enabled:
+            return
+        folder_path = Path(__file__).parent.parent / folder
+        folder_path.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        for histogram in summary['histograms'].values():
+            for key, value in histogram.items():
+                if value == math.inf:
+                    histogram[key] = '+Inf'
+        for filename, content in (
+            (f'{self.prefix}.prom', self.render_prometheus()),
+            (
+                'run_summary.json',
+                json.dumps(summary, ensure_ascii=False, indent=2)
+            ),
+        ):
+            temp_path = folder_path / f'.{filename}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                file.write(content)
+            os.replace(temp_path, folder_path / filename)
+
+
+metrics = MetricsRegistry()
+"""Реестр метрик процесса."""
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from handler.constants import (FEEDS_FOLDER, IMAGE_FOLDER, STATE_FOLDER,
+                               STEM_MIGRATION_FILE)
+from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
+from handler.feed_index import IndexedOffer, load_feed_index
+from handler.mixins import FileMixin
+from handler.picture_rules import DEFAULT_RULES, PictureRule
+from handler.publisher import atomic_write, get_publisher
+
+logger = logging.getLogger(__name__)
+
+LEGACY_RULE = DEFAULT_RULES[0]
+"""Правило, совпадающее с фильтром изображений до появления правил."""
+
+
+def legacy_stems(offer: IndexedOffer) -> dict[str, str]:
+    """
+    Функция, возвращает словарь '{старое имя}: {ссылка}' оффера.
+
+    До правил отбора изображения назывались '{offer_id}_{номер}'
+    по позиции среди ссылок, прошедших фильтр по умолчанию.
+    """
+    return {
+        f'{offer.offer_id}_{index}': url
+        for index, url in enumerate(
+            LEGACY_RULE.select(offer.attrs, list(offer.pictures))
+        )
+    }
+
+
+class StemMigrator(FileMixin):
+    """
+    Класс разовой миграции имен изображений.
+
+    Переименовывает оригиналы и изображения вариантов из позиционных
+    имен '{offer_id}_{номер}' в имена по правилу и ссылке, чтобы
+    после обновления изображения не удалялись очисткой и не скачивались
+    заново. Соответствие строится по индексам фидов. Выполненная
+    миграция директории отмечается в директории состояния.
+    """
+
+    def __init__(
+        self,
+        filenames: list,
+        variants,
+        feeds_folder: str = FEEDS_FOLDER,
+        image_folder: str = IMAGE_FOLDER,
+        rules: tuple[PictureRule, ...] | None = None,
+        state_folder: str = STATE_FOLDER
+    ) -> None:
+        self.filenames = filenames
+        self.variants = variants
+        self.feeds_folder = feeds_folder
+        self.image_folder = image_folder
+        self.rules = rules
+        self.state_folder = state_folder
+
+    def _marker_path(self) -> Path:
+        """Защищенный метод, возвращает путь к отметке миграции."""
+        return self._make_dir(self.state_folder) / STEM_MIGRATION_FILE
+
+    def _load_done(self) -> dict[str, float]:
+        """Защищенный метод, читает мигрированные директории."""
+        file_path = self._marker_path()
+        if not file_path.exists():
+            return {}
+        try:
+            with open(file_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning('Не удалось прочитать отметку миграции: %s', error)
+            return {}
+
+    def _renames(self) -> tuple[int, dict[str, str]]:
+        """
+        Защищенный метод, возвращает число офферов фидов и словарь
+        '{старое имя}: {новое имя}' без расширений.
+        """
+        offers_count = 0
+        renames = {}
+        for filename in self.filenames:
+            offers = load_feed_index(self.feeds_folder, filename, self.rules)
+            for offer in offers:
+                offers_count += 1
+                new_stems = {url: stem for stem, url in offer.selected}
+                for old_stem, url in legacy_stems(offer).items():
+                    if url in new_stems and old_stem != new_stems[url]:
+                        renames[old_stem] = new_stems[url]
+        return offers_count, renames
+
+    def _migrate_folder(self, folder: str, renames: dict[str, str]) -> int:
+        """Защищенный метод, переименовывает файлы одной директории."""
+        try:
+            filenames = self._get_files_list(folder)
+        except (DirectoryCreationError, EmptyFeedsListError):
+            return 0
+        folder_path = self._make_dir(folder)
+        publisher = get_publisher(folder)
+        existing = set(filenames)
+        renamed = 0
+        for filename in filenames:
+            stem, dot, extension = filename.partition('.')
+            new_stem = renames.get(stem)
+            if new_stem is None:
+                continue
+            new_name = f'{new_stem}{dot}{extension}'
+            if new_name in existing:
+                continue
+            os.replace(folder_path / filename, folder_path / new_name)
+            publisher.forget(filename)
+            existing.add(new_name)
+            renamed += 1
+        return renamed
+
+    def migrate(self) -> int:
+        """
+        Метод переименовывает изображения во всех директориях,
+        еще не отмеченных как мигрированные.
+
+        Без офферов в фидах ничего не делает и не ставит отметку.
+        Возвращает число переименованных файлов: если оно не нулевое,
+        уже построенный кэш изображений нужно сбросить.
+        """
+        folders = [self.image_folder]
+        folders.extend(variant.folder for variant in self.variants)
+        done = self._load_done()
+        pending = [folder for folder in folders if folder not in done]
+        if not pending:
+            return 0
+        offers_count, renames = self._renames()
+        if not offers_count:
+            logging.warning('В фидах нет офферов, миграция имен отложена')
+            return 0
+        renamed = 0
+        for folder in pending:
+            renamed += self._migrate_folder(folder, renames)
+            done[folder] = time.time()
+        atomic_write(
+            self._marker_path(),
+            json.dumps(done, ensure_ascii=False).encode()
+        )
+        logger.bot_event(
+            'Переименовано изображений в имена по правилам отбора - %s',
+            renamed
+        )
+        return renamed
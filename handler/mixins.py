@@ -1,12 +1,12 @@
 import logging
+import os
 import xml.etree.ElementTree as ET
 from pathlib import Path
 
+from handler.constants import XML_OUTPUT_ENCODING
 from handler.exceptions import (DirectoryCreationError, EmptyFeedsListError,
                                 GetTreeError)
-from handler.logging_config import setup_logging
-
-setup_logging()
+from handler.publisher import get_publisher
 
 
 class FileMixin:
@@ -43,17 +43,32 @@ class FileMixin:
                 raise
         return image_dict
 
-    def _save_xml(self, elem, file_folder, filename) -> None:
-        """Защищенный метод, сохраняет отформатированные файлы."""
-        root = elem
-        self._indent(root)
-        formatted_xml = ET.tostring(root, encoding='windows-1251')
-        file_path = self._make_dir(file_folder)
-        with open(
-            file_path / filename,
-            'wb'
-        ) as f:
-            f.write(formatted_xml)
+    def _xml_bytes(self, elem) -> bytes:
+        """Защищенный метод, возвращает отформатированный XML в байтах."""
+        self._indent(elem)
+        return ET.tostring(elem, encoding=XML_OUTPUT_ENCODING)
+
+    def _publish_file(self, data: bytes, file_folder, filename) -> bool:
+        """
+        Защищенный метод, публикует файл фида.
+
+        Файл записывается атомарно и только при изменении содержимого.
+        Возвращает True, если файл был записан.
+        """
+        self._make_dir(file_folder)
+        return get_publisher(file_folder).publish(
+            filename,
+            data,
+            kind='feed'
+        )
+
+    def _save_xml(self, elem, file_folder, filename) -> bool:
+        """Защищенный метод, публикует отформатированный файл."""
+        return self._publish_file(
+            self._xml_bytes(elem),
+            file_folder,
+            filename
+        )
 
     def _indent(self, elem, level=0) -> None:
         """Защищенный метод, расставляет правильные отступы в XML файлах."""
@@ -75,11 +90,10 @@ class FileMixin:
         """Защищенный метод, возвращает список названий фидов."""
         folder_path = Path(__file__).parent.parent / folder_name
         if not folder_path.exists():
-            logging.error(f'Папка {folder_name} не существует')
+            logging.error('Папка %s не существует', folder_name)
             raise DirectoryCreationError(f'Папка {folder_name} не найдена')
-        files_names = [
-            file.name for file in folder_path.iterdir() if file.is_file()
-        ]
+        with os.scandir(folder_path) as entries:
+            files_names = [entry.name for entry in entries if entry.is_file()]
         if not files_names:
             logging.error('В папке нет файлов')
             raise EmptyFeedsListError('Нет скачанных файлов')
@@ -93,16 +107,17 @@ class FileMixin:
         """
         folder_path = Path(__file__).parent.parent / folder_name
         if not folder_path.exists():
-            logging.error(f'Папка {folder_name} не существует')
+            logging.error('Папка %s не существует', folder_name)
             raise DirectoryCreationError(f'Папка {folder_name} не найдена')
-        files_dict = {
-            file.name.split('.')[0]: file.name for file
-            in folder_path.iterdir() if file.is_file()
-        }
+        with os.scandir(folder_path) as entries:
+            files_dict = {
+                entry.name.split('.')[0]: entry.name for entry
+                in entries if entry.is_file()
+            }
         if not files_dict:
             logging.error('В папке нет файлов')
             raise EmptyFeedsListError('Нет скачанных файлов')
-        logging.debug(f'Найдены файлы: {files_dict}')
+        logging.debug('Найдены файлы: %s', files_dict)
         return files_dict
 
     def _build_set(self, folder: str, target_set: set):
@@ -147,7 +162,7 @@ class FileMixin:
             file_path = (
                 Path(__file__).parent.parent / folder_name / file_name
             )
-            logging.debug(f'Путь к файлу: {file_path}')
+            logging.debug('Путь к файлу: %s', file_path)
             tree = ET.parse(file_path)
             return tree.getroot()
         except Exception as error:
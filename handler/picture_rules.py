@@ -0,0 +1,204 @@
+import functools
+import hashlib
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from handler.constants import PICTURE_RULES_CONFIG
+from handler.exceptions import PictureRuleError
+
+
+def attr_value(value) -> str:
+    """
+    Функция, приводит значение условия к строке атрибута XML.
+
+    Логические значения JSON записываются как 'true' и 'false'.
+    """
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+@dataclass(frozen=True)
+class PictureRule:
+    """
+    Правило отбора ссылок picture оффера.
+
+    Ссылка отбирается, если она совпадает с pattern, не совпадает
+    с exclude, стоит на одной из позиций positions (с 1, в порядке
+    тегов picture) и атрибуты оффера удовлетворяют attrs (значение
+    или список допустимых значений, сравниваются как строки).
+    Правило отбирает не больше max_pictures ссылок. Пустое условие
+    не проверяется.
+    """
+
+    name: str
+    pattern: str = ''
+    exclude: str = ''
+    positions: tuple[int, ...] = ()
+    attrs: dict = field(default_factory=dict)
+    max_pictures: int | None = None
+    _pattern: re.Pattern | None = field(
+        init=False,
+        repr=False,
+        compare=False,
+        default=None
+    )
+    _exclude: re.Pattern | None = field(
+        init=False,
+        repr=False,
+        compare=False,
+        default=None
+    )
+
+    def __post_init__(self) -> None:
+        for name in ('pattern', 'exclude'):
+            value = getattr(self, name)
+            object.__setattr__(
+                self,
+                f'_{name}',
+                re.compile(value) if value else None
+            )
+        object.__setattr__(self, 'positions', tuple(self.positions))
+        object.__setattr__(self, 'attrs', {
+            key: tuple(
+                attr_value(item) for item in (
+                    value if isinstance(value, (list, tuple)) else (value,)
+                )
+            )
+            for key, value in self.attrs.items()
+        })
+
+    def definition(self) -> dict:
+        """Метод возвращает описание правила без скомпилированных полей."""
+        return {
+            key: value for key, value in asdict(self).items()
+            if not key.startswith('_')
+        }
+
+    def matches_offer(self, attrs: dict) -> bool:
+        """Метод проверяет условия правила на атрибуты оффера."""
+        return all(
+            attrs.get(key) in values for key, values in self.attrs.items()
+        )
+
+    def select(self, attrs: dict, pictures: list[str]) -> list[str]:
+        """Метод возвращает отобранные правилом ссылки оффера."""
+        if not self.matches_offer(attrs):
+            return []
+        selected = []
+        for position, url in enumerate(pictures, start=1):
+            if self.positions and position not in self.positions:
+                continue
+            if self._pattern and not self._pattern.search(url):
+                continue
+            if self._exclude and self._exclude.search(url):
+                continue
+            selected.append(url)
+            if len(selected) == self.max_pictures:
+                break
+        return selected
+
+
+DEFAULT_RULES = (
+    PictureRule(name='default', pattern=r'[12]\.jpg', exclude='Technical'),
+)
+"""Правило по умолчанию: изображения '1.jpg' и '2.jpg' без технических."""
+
+
+def image_stem(offer_id: str, rule_name: str, url: str) -> str:
+    """
+    Функция, возвращает имя файла изображения без расширения.
+
+    Имя зависит от правила и ссылки, а не от позиции, поэтому
+    изменение правил затрагивает только изменившиеся изображения.
+    """
+    digest = hashlib.sha1(f'{rule_name}\n{url}'.encode()).hexdigest()
+    return f'{offer_id}_{digest[:12]}'
+
+
+def select_pictures(
+    rules: tuple[PictureRule, ...],
+    offer_id: str,
+    attrs: dict,
+    pictures: list[str]
+) -> list[tuple[str, str]]:
+    """
+    Функция, применяет правила к офферу.
+
+    Возвращает пары (имя файла без расширения, ссылка) в порядке
+    правил и тегов picture. Ссылка, отобранная несколькими
+    правилами, достается первому из них.
+    """
+    selected = []
+    seen = set()
+    for rule in rules:
+        for url in rule.select(attrs, pictures):
+            if url in seen:
+                continue
+            seen.add(url)
+            selected.append((image_stem(offer_id, rule.name, url), url))
+    return selected
+
+
+def rules_fingerprint(rules: tuple[PictureRule, ...]) -> str:
+    """Функция, возвращает отпечаток набора правил."""
+    return hashlib.sha1(json.dumps(
+        [rule.definition() for rule in rules],
+        sort_keys=True
+    ).encode()).hexdigest()
+
+
+def parse_rules(raw_rules: list[dict]) -> tuple[PictureRule, ...]:
+    """Функция, собирает и компилирует правила из списка словарей."""
+    if not raw_rules:
+        raise PictureRuleError('Список правил пуст')
+    rules = []
+    for raw in raw_rules:
+        try:
+            rule = PictureRule(**raw)
+        except (TypeError, AttributeError) as error:
+            raise PictureRuleError(f'Некорректное правило {raw}: {error}')
+        except re.error as error:
+            raise PictureRuleError(
+                f'Некорректное выражение правила {raw.get("name")}: {error}'
+            )
+        if rule.max_pictures is not None and rule.max_pictures < 1:
+            raise PictureRuleError(
+                f'max_pictures правила {rule.name} меньше 1'
+            )
+        rules.append(rule)
+    names = [rule.name for rule in rules]
+    if len(names) != len(set(names)):
+        raise PictureRuleError('Имена правил должны быть уникальными')
+    return tuple(rules)
+
+
+@functools.cache
+def load_rules(
+    config_path: str = PICTURE_RULES_CONFIG
+) -> tuple[PictureRule, ...]:
+    """
+    Функция, загружает и компилирует правила из JSON-файла.
+
+    Если путь к конфигурации не задан, возвращает правило
+    по умолчанию. Результат кэшируется на время процесса.
+    """
+    if not config_path:
+        return DEFAULT_RULES
+    try:
+        with open(
+            Path(__file__).parent.parent / config_path,
+            encoding='utf-8'
+        ) as file:
+            raw_rules = json.load(file)
+    except (OSError, json.JSONDecodeError) as error:
+        logging.error(
+            'Не удалось прочитать правила отбора изображений %s: %s',
+            config_path,
+            error
+        )
+        raise PictureRuleError(f'Ошибка чтения правил: {error}')
+    return parse_rules(raw_rules)
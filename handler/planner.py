@@ -0,0 +1,304 @@
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+
+from handler.constants import (DEFERRED_PLAN_FILE, EST_DOWNLOAD_SECONDS,
+                               EST_RENDER_SECONDS, EST_REWRITE_SECONDS,
+                               NEW_FEEDS_FOLDER, PLAN_BATCH_SIZE,
+                               RUN_TIME_BUDGET, STATE_FOLDER)
+from handler.decorators import time_of_function
+from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
+from handler.feeds_handler import FeedHandler
+from handler.mixins import FileMixin
+
+logger = logging.getLogger(__name__)
+
+KIND_DOWNLOAD = 'download'
+KIND_RENDER = 'render'
+KIND_REWRITE = 'rewrite'
+
+
+@dataclass
+class WorkItem:
+    """Единица работы плана запуска."""
+
+    kind: str
+    key: str
+    cost: float
+    score: int = 0
+    order: int = 0
+    payload: dict = field(default_factory=dict)
+
+    @property
+    def mandatory(self) -> bool:
+        """Перезапись фидов выполняется всегда, вне бюджета времени."""
+        return self.kind == KIND_REWRITE
+
+
+class RunPlanner(FileMixin):
+    """
+    Класс, строящий полный список работ запуска и выполняющий его
+    в порядке приоритета в пределах бюджета времени.
+
+    Приоритет оффера складывается из признаков: оффер еще не имеет
+    обрамленных изображений, оффер доступен (available="true"),
+    работа по офферу была отложена прошлым запуском. Невыполненная
+    за бюджет работа сохраняется и поднимается в приоритете
+    в следующем запуске. Перезапись фидов выполняется всегда.
+    Изображения по известным нерабочим ссылкам не планируются.
+    """
+
+    def __init__(
+        self,
+        image_client,
+        variants,
+        time_budget: float = RUN_TIME_BUDGET,
+        state_folder: str = STATE_FOLDER,
+        batch_size: int = PLAN_BATCH_SIZE,
+        new_feeds_folder: str = NEW_FEEDS_FOLDER
+    ) -> None:
+        self.image_client = image_client
+        self.variants = variants
+        self.time_budget = time_budget
+        self.state_folder = state_folder
+        self.batch_size = batch_size
+        self.new_feeds_folder = new_feeds_folder
+        self.summary: dict = {}
+        self._offer_images: dict[str, list[tuple[str, str]]] = {}
+        self._deferred_keys = self._load_deferred()
+
+    def _load_deferred(self) -> set[str]:
+        """Защищенный метод, читает отложенные прошлым запуском ключи."""
+        file_path = self._make_dir(self.state_folder) / DEFERRED_PLAN_FILE
+        if not file_path.exists():
+            return set()
+        try:
+            with open(file_path, encoding='utf-8') as file:
+                return set(json.load(file).get('keys', []))
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning('Не удалось прочитать отложенный план: %s', error)
+            return set()
+
+    def _save_deferred(self, items: list[WorkItem]) -> None:
+        """Защищенный метод, сохраняет ключи отложенной работы."""
+        file_path = self._make_dir(self.state_folder) / DEFERRED_PLAN_FILE
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    'saved_at': time.time(),
+                    'keys': [item.key for item in items]
+                },
+                file,
+                ensure_ascii=False
+            )
+
+    def _score(self, offer, main_stem: str) -> int:
+        """Защищенный метод, считает приоритет оффера по атрибутам."""
+        score = 0
+        if self.image_client.missing_variants(main_stem):
+            score += 4
+        if offer.get('available', 'true').lower() == 'true':
+            score += 2
+        return score
+
+    @time_of_function
+    def build(self) -> list[WorkItem]:
+        """Метод строит отсортированный по приоритету список работ."""
+        self.image_client.load_image_index()
+        originals = {}
+        try:
+            originals = self._get_files_dict(self.image_client.image_folder)
+        except (DirectoryCreationError, EmptyFeedsListError):
+            logging.warning('Скачанные изображения отсутствуют')
+
+        items: list[WorkItem] = []
+        offers_per_feed: dict[str, int] = {}
+        download_cost = (
+            EST_DOWNLOAD_SECONDS + EST_RENDER_SECONDS * len(self.variants)
+        )
+        for filename, offer in self.image_client.iter_offers():
+            offers_per_feed[filename] = offers_per_feed.get(filename, 0) + 1
+            offer_id = str(offer.get('id'))
+            offer_images = self.image_client.select_offer_images(offer)
+            if not offer_images:
+                continue
+            stems = [image_stem for image_stem, _ in offer_images]
+            score = self._score(offer, stems[0])
+            missing = [
+                (stem, url) for stem, url in offer_images
+                if not self.image_client.has_original(stem)
+            ]
+            self._offer_images.setdefault(filename, []).extend(missing)
+            missing = [
+                stem for stem, url in missing
+                if not self.image_client.links.is_dead(url)
+            ]
+            if missing:
+                key = f'{KIND_DOWNLOAD}:{offer_id}'
+                items.append(WorkItem(
+                    kind=KIND_DOWNLOAD,
+                    key=key,
+                    cost=len(missing) * download_cost,
+                    score=score + (key in self._deferred_keys),
+                    payload={
+                        'offer_id': offer_id,
+                        'offer_images': offer_images
+                    }
+                ))
+            for stem in stems:
+                if stem not in originals:
+                    continue
+                pending = self.image_client.missing_variants(stem)
+                if not pending:
+                    continue
+                key = f'{KIND_RENDER}:{stem}'
+                items.append(WorkItem(
+                    kind=KIND_RENDER,
+                    key=key,
+                    cost=EST_RENDER_SECONDS * len(pending),
+                    score=score + (key in self._deferred_keys),
+                    payload={'image_name': originals[stem]}
+                ))
+
+        for order, item in enumerate(items):
+            item.order = order
+        items.sort(key=lambda item: (-item.score, item.order))
+
+        for variant in self.variants:
+            for filename, offers_count in offers_per_feed.items():
+                items.append(WorkItem(
+                    kind=KIND_REWRITE,
+                    key=f'{KIND_REWRITE}:{variant.name}:{filename}',
+                    cost=offers_count * EST_REWRITE_SECONDS,
+                    payload={'filename': filename, 'variant': variant}
+                ))
+        return items
+
+    def print_plan(self, items: list[WorkItem], limit: int = 50) -> None:
+        """Метод выводит план запуска с оценкой стоимости."""
+        totals: dict[str, tuple[int, float]] = {}
+        for item in items:
+            count, cost = totals.get(item.kind, (0, 0.0))
+            totals[item.kind] = (count + 1, cost + item.cost)
+        print(f'План запуска: {len(items)} работ')
+        for kind, (count, cost) in totals.items():
+            print(f'  {kind}: {count} шт., оценка {round(cost, 1)} сек.')
+        budget = self.time_budget or 'без ограничения'
+        print(f'Бюджет времени: {budget}')
+        print(f'Первые {min(limit, len(items))} работ:')
+        for item in items[:limit]:
+            print(
+                f'  [{item.score}] {item.key} '
+                f'~{round(item.cost, 2)} сек.'
+            )
+
+    def _flush_downloads(
+        self,
+        offers: list[tuple[str, list[tuple[str, str]]]],
+        image_names: list[str]
+    ) -> int:
+        """
+        Защищенный метод, скачивает накопленную пачку офферов.
+
+        Сохраненные изображения добавляются в пачку на наложение рамки.
+        """
+        if not offers:
+            return 0
+        saved = self.image_client.download_images(offers)
+        offers.clear()
+        image_names.extend(saved)
+        return len(saved)
+
+    def _flush_renders(self, image_names: list[str]) -> int:
+        """Защищенный метод, обрабатывает накопленную пачку изображений."""
+        if not image_names:
+            return 0
+        statuses = self.image_client.frame_images(image_names)
+        image_names.clear()
+        return statuses['variants']
+
+    @time_of_function
+    def execute(self, items: list[WorkItem]) -> list[WorkItem]:
+        """
+        Метод выполняет план в пределах бюджета времени.
+
+        Скачивания и наложение рамки выполняются пачками
+        по batch_size работ. Возвращает список отложенных работ,
+        итоговые счетчики сохраняются в summary.
+        """
+        start_time = time.monotonic()
+        deferred: list[WorkItem] = []
+        download_batch: list[tuple[str, list[tuple[str, str]]]] = []
+        render_batch: list[str] = []
+        batch_cost = 0.0
+        downloaded = 0
+        framed = 0
+        rewritten = 0
+
+        for item in items:
+            if item.mandatory:
+                continue
+            elapsed = time.monotonic() - start_time + batch_cost
+            if self.time_budget and elapsed + item.cost > self.time_budget:
+                deferred.append(item)
+                continue
+            if item.kind == KIND_DOWNLOAD:
+                download_batch.append((
+                    item.payload['offer_id'],
+                    item.payload['offer_images']
+                ))
+            elif item.kind == KIND_RENDER:
+                render_batch.append(item.payload['image_name'])
+            batch_cost += item.cost
+            if len(download_batch) + len(render_batch) >= self.batch_size:
+                downloaded += self._flush_downloads(
+                    download_batch,
+                    render_batch
+                )
+                framed += self._flush_renders(render_batch)
+                batch_cost = 0.0
+        downloaded += self._flush_downloads(download_batch, render_batch)
+        framed += self._flush_renders(render_batch)
+
+        for item in items:
+            if not item.mandatory:
+                continue
+            variant = item.payload['variant']
+            handler_client = FeedHandler(
+                item.payload['filename'],
+                feeds_folder=self.image_client.feeds_folder,
+                new_feeds_folder=self.new_feeds_folder,
+                new_image_folder=variant.folder,
+                address_ftp_images=variant.url_prefix,
+                image_dict=self.image_client.framed_image_dict(
+                    variant,
+                    [item.payload['filename']]
+                ),
+                rules=self.image_client.rules
+            )
+            handler_client.replace_images().save(prefix=variant.feed_prefix)
+            rewritten += 1
+
+        self._save_deferred(deferred)
+        self.image_client.links.save()
+        dead_links = {
+            filename: self.image_client.dead_links(offer_images)
+            for filename, offer_images in self._offer_images.items()
+        }
+        self.summary = {
+            'downloaded': downloaded,
+            'framed': framed,
+            'rewritten': rewritten,
+            'deferred': len(deferred),
+            'dead_links': dead_links,
+        }
+        logger.bot_event('Скачано изображений по плану - %s', downloaded)
+        logger.bot_event('Обрамлено изображений по плану - %s', framed)
+        logger.bot_event('Перезаписано фидов по плану - %s', rewritten)
+        logger.bot_event(
+            'Отложено работ до следующего запуска - %s',
+            len(deferred)
+        )
+        self.image_client.log_dead_links(dead_links)
+        return deferred
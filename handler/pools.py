@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SharedPool:
+    """
+    Пул потоков, разделяемый между несколькими владельцами.
+
+    Каждому владельцу (магазину) назначается квота - число его задач,
+    одновременно находящихся в пуле. Владелец, исчерпавший квоту,
+    ждет завершения своих задач и не занимает очередь пула,
+    поэтому большой магазин не вытесняет остальные.
+    """
+
+    def __init__(self, max_workers: int, name: str = 'pool') -> None:
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=name
+        )
+        self._quotas: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def set_quota(self, owner: str, limit: int) -> None:
+        """Метод назначает квоту владельца."""
+        with self._lock:
+            self._quotas[owner] = threading.BoundedSemaphore(
+                max(1, min(limit, self.max_workers))
+            )
+
+    def _quota(self, owner: str) -> threading.BoundedSemaphore:
+        """Защищенный метод, возвращает квоту владельца."""
+        with self._lock:
+            if owner not in self._quotas:
+                self._quotas[owner] = threading.BoundedSemaphore(
+                    self.max_workers
+                )
+            return self._quotas[owner]
+
+    def map(self, func, items, owner: str = ''):
+        """
+        Генератор результатов func по элементам в исходном порядке.
+
+        Новая задача отправляется в пул только при свободной квоте
+        владельца.
+        """
+        quota = self._quota(owner)
+        futures = []
+        for item in items:
+            quota.acquire()
+            try:
+                future = self._executor.submit(func, item)
+            except Exception:
+                quota.release()
+                raise
+            future.add_done_callback(lambda _: quota.release())
+            futures.append(future)
+        for future in futures:
+            yield future.result()
+
+    def shutdown(self) -> None:
+        """Метод останавливает пул после завершения задач."""
+        self._executor.shutdown(wait=True)
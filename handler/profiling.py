@@ -0,0 +1,139 @@
+import cProfile
+import functools
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import resource
+import threading
+import time
+import tracemalloc
+from datetime import datetime as dt
+
+from handler.constants import PROFILE_MODES, PROFILE_STAGES, PROFILE_TOP_LINES
+from handler.logging_config import get_log_dir
+
+_profiled_stages = {
+    stage.strip() for stage in PROFILE_STAGES.split(',') if stage.strip()
+}
+_modes = {mode.strip() for mode in PROFILE_MODES.split(',') if mode.strip()}
+_active = False
+_active_lock = threading.Lock()
+_sequence = itertools.count(1)
+
+
+def is_profiled(stage: str) -> bool:
+    """Функция, проверяет, включено ли профилирование стадии."""
+    return 'all' in _profiled_stages or stage in _profiled_stages
+
+
+def _peak_rss_kb() -> int:
+    """Функция, возвращает пиковый RSS процесса в килобайтах."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StageProfiler:
+    """
+    Контекстный менеджер профилирования одной стадии.
+
+    Снимает статистику cProfile, снимок tracemalloc и пиковый RSS
+    процесса до и после стадии и пишет их в датированную директорию
+    логов рядом с логом запуска. Пиковый RSS считается за всю жизнь
+    процесса, поэтому прирост пика - нижняя оценка памяти стадии.
+    cProfile и tracemalloc запускаются только одной стадией процесса
+    за раз: вложенная или параллельная стадия попадает в ее отчет.
+    cProfile видит только поток, вызвавший стадию. Трассировка
+    tracemalloc, включенная вне профилировщика, не останавливается.
+    """
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.owner = False
+        self.started_tracing = False
+        self.profiler = None
+        self.report: dict = {'stage': stage}
+
+    def __enter__(self):
+        global _active
+        with _active_lock:
+            self.owner = not _active
+            _active = True
+        if self.owner:
+            if 'cpu' in _modes:
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+            if 'memory' in _modes and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+        self.report['process_peak_rss_before_kb'] = _peak_rss_kb()
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active
+        self.report['wall_seconds'] = round(
+            time.perf_counter() - self.start_time,
+            3
+        )
+        peak_rss = _peak_rss_kb()
+        self.report['process_peak_rss_after_kb'] = peak_rss
+        self.report['peak_rss_growth_kb'] = peak_rss - self.report[
+            'process_peak_rss_before_kb'
+        ]
+        prefix = os.path.join(
+            get_log_dir(),
+            f'{dt.now().strftime("%Y%m%d%H%M%S")}_{os.getpid()}_'
+            f'{next(_sequence):04d}_{self.stage}'
+        )
+        if self.owner:
+            if self.profiler is not None:
+                self.profiler.disable()
+                self.profiler.dump_stats(f'{prefix}.prof')
+                stream = io.StringIO()
+                pstats.Stats(self.profiler, stream=stream).sort_stats(
+                    'cumulative'
+                ).print_stats(PROFILE_TOP_LINES)
+                with open(f'{prefix}_cpu.txt', 'w', encoding='utf-8') as file:
+                    file.write(stream.getvalue())
+            if tracemalloc.is_tracing() and 'memory' in _modes:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if self.started_tracing:
+                    tracemalloc.stop()
+                self.report['tracemalloc_peak_kb'] = peak // 1024
+                top_stats = snapshot.statistics('lineno')[:PROFILE_TOP_LINES]
+                with open(
+                    f'{prefix}_memory.txt',
+                    'w',
+                    encoding='utf-8'
+                ) as file:
+                    file.write('\n'.join(str(stat) for stat in top_stats))
+            with _active_lock:
+                _active = False
+        with open(f'{prefix}_profile.json', 'w', encoding='utf-8') as file:
+            json.dump(self.report, file, ensure_ascii=False, indent=2)
+        logging.info(
+            'Профиль стадии %s записан в %s*',
+            self.stage,
+            prefix
+        )
+        return False
+
+
+def profile_stage(func):
+    """
+    Декоратор профилирования стадии.
+
+    Если стадия не указана в PROFILE_STAGES, возвращает функцию
+    без изменений, поэтому выключенное профилирование ничего не стоит.
+    """
+    if not is_profiled(func.__name__):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with StageProfiler(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,77 @@
+import logging
+
+from handler.constants import FEEDS_FOLDER, IMAGE_FOLDER
+from handler.decorators import time_of_function
+from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
+from handler.feed_index import load_feed_index
+from handler.mixins import FileMixin
+
+logger = logging.getLogger(__name__)
+
+
+class ImagePruner(FileMixin):
+    """
+    Класс, удаляющий изображения, на которые больше не ссылаются фиды.
+
+    Изображение остается, пока его отбирает правило отбора
+    у оффера из фида: удаляются изображения исчезнувших офферов
+    и изображения, которые перестали отбираться после изменения
+    правил. Очищает директорию оригиналов и директории всех
+    вариантов. Если в фидах не найдено ни одного оффера,
+    ничего не удаляет.
+    """
+
+    def __init__(
+        self,
+        filenames: list,
+        variants,
+        feeds_folder: str = FEEDS_FOLDER,
+        image_folder: str = IMAGE_FOLDER
+    ) -> None:
+        self.filenames = filenames
+        self.variants = variants
+        self.feeds_folder = feeds_folder
+        self.image_folder = image_folder
+
+    def _collect_image_stems(self) -> tuple[int, set[str]]:
+        """
+        Защищенный метод, возвращает число офферов всех фидов
+        и имена (без расширения) отобранных для них изображений.
+        """
+        offers_count = 0
+        image_stems = set()
+        for filename in self.filenames:
+            for offer in load_feed_index(self.feeds_folder, filename):
+                offers_count += 1
+                image_stems.update(stem for stem, _ in offer.selected)
+        return offers_count, image_stems
+
+    @time_of_function
+    def prune(self, dry_run: bool = False) -> int:
+        """Метод удаляет устаревшие изображения и возвращает их число."""
+        offers_count, image_stems = self._collect_image_stems()
+        if not offers_count:
+            logging.warning('В фидах нет офферов, очистка пропущена')
+            return 0
+
+        removed = 0
+        folders = [self.image_folder]
+        folders.extend(variant.folder for variant in self.variants)
+        for folder in folders:
+            try:
+                filenames = self._get_files_list(folder)
+            except (DirectoryCreationError, EmptyFeedsListError):
+                continue
+            folder_path = self._make_dir(folder)
+            for filename in filenames:
+                if filename.split('.')[0] in image_stems:
+                    continue
+                if not dry_run:
+                    (folder_path / filename).unlink(missing_ok=True)
+                removed += 1
+        logger.bot_event(
+            'Удалено изображений, на которые не ссылаются фиды - %s%s',
+            removed,
+            ' (пробный запуск)' if dry_run else ''
+        )
+        return removed
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from handler.constants import PUBLISH_FOLDER, STATE_FOLDER
+from handler.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    """Функция, возвращает хеш содержимого файла."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(file_path: Path, data: bytes) -> None:
+    """
+    Функция, записывает файл через временный файл и переименование.
+
+    Читатель видит либо старую, либо новую версию файла целиком.
+    """
+    temp_path = file_path.with_name(
+        f'.{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp'
+    )
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+class Publisher:
+    """
+    Класс публикации файлов в раздаваемую директорию.
+
+    Файл записывается только если его содержимое отличается
+    от опубликованного. Хеши опубликованных файлов хранятся
+    в манифесте в директории состояния, при отсутствии записи
+    в манифесте хеш считается по файлу на диске. Запись выполняется
+    атомарной заменой файла.
+    """
+
+    def __init__(self, folder: str, state_folder: str = STATE_FOLDER) -> None:
+        self.folder_path = Path(__file__).parent.parent / folder
+        manifest_name = hashlib.sha1(
+            str(self.folder_path.resolve()).encode()
+        ).hexdigest()[:10]
+        manifest_folder = Path(__file__).parent.parent / state_folder
+        self.manifest_path = manifest_folder / PUBLISH_FOLDER / (
+            f'{self.folder_path.name}_{manifest_name}.json'
+        )
+        self.published: dict[str, int] = {}
+        self.skipped: dict[str, int] = {}
+        self._manifest = self._load_manifest()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load_manifest(self) -> dict[str, list]:
+        """Защищенный метод, читает манифест опубликованных файлов."""
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning(
+                'Не удалось прочитать манифест %s: %s',
+                self.manifest_path,
+                error
+            )
+            return {}
+
+    def _published_hash(self, filename: str) -> str | None:
+        """Защищенный метод, возвращает хеш опубликованного файла."""
+        file_path = self.folder_path / filename
+        try:
+            size = file_path.stat().st_size
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            entry = self._manifest.get(filename)
+        if entry and entry[0] == size:
+            return entry[1]
+        with open(file_path, 'rb') as file:
+            return content_hash(file.read())
+
+    def publish(self, filename: str, data: bytes, kind: str = 'file') -> bool:
+        """
+        Метод публикует файл, если его содержимое изменилось.
+
+        Возвращает True, если файл был записан.
+        """
+        digest = content_hash(data)
+        published = digest != self._published_hash(filename)
+        if published:
+            self.folder_path.mkdir(parents=True, exist_ok=True)
+            atomic_write(self.folder_path / filename, data)
+        status = 'published' if published else 'skipped'
+        metrics.inc('publishes_total', kind=kind, status=status)
+        with self._lock:
+            counters = self.published if published else self.skipped
+            counters[kind] = counters.get(kind, 0) + 1
+            entry = [len(data), digest]
+            if self._manifest.get(filename) != entry:
+                self._manifest[filename] = entry
+                self._dirty = True
+        return published
+
+    def manifest_entry(self, filename: str) -> tuple[int, str] | None:
+        """Метод возвращает размер и хеш файла из манифеста."""
+        with self._lock:
+            entry = self._manifest.get(filename)
+        return tuple(entry) if entry else None
+
+    def record(self, filename: str, data: bytes) -> None:
+        """
+        Метод заносит в манифест хеш уже лежащего на диске файла.
+
+        Используется для файлов, записанных до появления манифеста.
+        """
+        entry = [len(data), content_hash(data)]
+        with self._lock:
+            self._manifest[filename] = entry
+            self._dirty = True
+
+    def forget(self, filename: str) -> None:
+        """Метод удаляет файл из манифеста."""
+        with self._lock:
+            if self._manifest.pop(filename, None) is not None:
+                self._dirty = True
+
+    def pop_counters(self) -> tuple[dict[str, int], dict[str, int]]:
+        """Метод возвращает и сбрасывает счетчики публикаций."""
+        with self._lock:
+            counters = (self.published, self.skipped)
+            self.published, self.skipped = {}, {}
+        return counters
+
+    def save(self) -> None:
+        """Метод сохраняет манифест, если он изменился."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._manifest).encode()
+            self._dirty = False
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.manifest_path, data)
+
+
+_publishers: dict[str, Publisher] = {}
+_publishers_lock = threading.Lock()
+
+
+def get_publisher(folder: str, state_folder: str = STATE_FOLDER) -> Publisher:
+    """
+    Функция, возвращает общий публикатор директории.
+
+    Директория состояния учитывается при первом вызове для директории.
+    """
+    with _publishers_lock:
+        if folder not in _publishers:
+            _publishers[folder] = Publisher(folder, state_folder)
+        return _publishers[folder]
+
+
+def flush_publishers() -> None:
+    """
+    Функция, сохраняет манифесты и сообщает итоги публикации.
+
+    Счетчики опубликованных и пропущенных файлов сбрасываются,
+    чтобы следующий запуск в том же процессе считал с нуля.
+    """
+    with _publishers_lock:
+        publishers = list(_publishers.values())
+    published: dict[str, int] = {}
+    skipped: dict[str, int] = {}
+    for publisher in publishers:
+        try:
+            publisher.save()
+        except OSError as error:
+            logging.error(
+                'Не удалось сохранить манифест %s: %s',
+                publisher.manifest_path,
+                error
+            )
+        for source, target in zip(publisher.pop_counters(), (
+            published,
+            skipped
+        )):
+            for kind, count in source.items():
+                target[kind] = target.get(kind, 0) + count
+    for kind in sorted(set(published) | set(skipped)):
+        logger.bot_event(
+            'Публикация (%s): записано %s, пропущено без изменений %s',
+            kind,
+            published.get(kind, 0),
+            skipped.get(kind, 0)
+        )
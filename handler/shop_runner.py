@@ -0,0 +1,171 @@
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from handler.constants import DOWNLOAD_WORKERS, FRAME_WORKERS, RUN_TIME_BUDGET
+from handler.decorators import time_of_function
+from handler.feeds_save import FeedSaver
+from handler.image_handler import FeedImage
+from handler.links import LinkChecker
+from handler.memory_budget import PixelBudget
+from handler.metrics import metrics
+from handler.migrations import StemMigrator
+from handler.planner import RunPlanner
+from handler.pools import SharedPool
+from handler.shops import Shop
+from handler.utils import get_filenames_list
+from handler.verify import ImageVerifier
+
+logger = logging.getLogger(__name__)
+
+
+class MultiShopRunner:
+    """
+    Класс запуска обработки нескольких магазинов в одном процессе.
+
+    Магазины обрабатываются параллельно и делят между собой
+    HTTP-сессию, бюджет пикселей, пул скачивания и пул наложения
+    рамки. В каждом пуле магазин занимает не больше своей квоты
+    потоков: заданной в конфигурации или равной доли пула.
+    Ошибка одного магазина не прерывает обработку остальных.
+    """
+
+    def __init__(
+        self,
+        shops: tuple[Shop, ...],
+        time_budget: int = RUN_TIME_BUDGET,
+        download_workers: int = DOWNLOAD_WORKERS,
+        render_workers: int = FRAME_WORKERS
+    ) -> None:
+        self.shops = shops
+        self.time_budget = time_budget
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=len(shops),
+            pool_maxsize=max(download_workers, len(shops))
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.budget = PixelBudget()
+        self.download_pool = SharedPool(download_workers, 'download')
+        self.render_pool = SharedPool(render_workers, 'render')
+        for shop in shops:
+            for pool in (self.download_pool, self.render_pool):
+                pool.set_quota(shop.name, self._quota(shop, pool))
+
+    def _quota(self, shop: Shop, pool: SharedPool) -> int:
+        """Защищенный метод, возвращает квоту магазина в пуле."""
+        if shop.quota:
+            return shop.quota
+        return math.ceil(pool.max_workers / len(self.shops))
+
+    def _run_shop(self, shop: Shop) -> dict:
+        """Защищенный метод, выполняет полный цикл одного магазина."""
+        start_time = time.monotonic()
+        try:
+            FeedSaver(
+                shop.feeds,
+                feeds_folder=shop.feeds_folder,
+                session=self.session,
+                rules=shop.picture_rules or None
+            ).save_xml()
+            variants = shop.image_variants
+            filenames = get_filenames_list(shop.feeds_folder)
+            StemMigrator(
+                filenames,
+                variants,
+                feeds_folder=shop.feeds_folder,
+                image_folder=shop.image_folder,
+                rules=shop.picture_rules or None,
+                state_folder=shop.state_folder
+            ).migrate()
+            image_client = FeedImage(
+                filenames,
+                images=[],
+                feeds_folder=shop.feeds_folder,
+                image_folder=shop.image_folder,
+                new_image_folder=shop.new_image_folder,
+                feeds_list=shop.feeds,
+                variants=variants,
+                budget=self.budget,
+                session=self.session,
+                download_pool=self.download_pool,
+                render_pool=self.render_pool,
+                owner=shop.name,
+                rules=shop.picture_rules or None,
+                links=LinkChecker(
+                    self.session,
+                    state_folder=shop.state_folder
+                )
+            )
+            ImageVerifier(
+                image_client,
+                state_folder=shop.state_folder
+            ).verify()
+            planner = RunPlanner(
+                image_client,
+                variants,
+                self.time_budget,
+                state_folder=shop.state_folder,
+                new_feeds_folder=shop.new_feeds_folder
+            )
+            planner.execute(planner.build())
+            result = {'status': 'SUCCESS', **planner.summary}
+        except Exception as error:
+            logging.error(
+                'Ошибка обработки магазина %s: %s',
+                shop.name,
+                error
+            )
+            result = {'status': 'FAILED', 'error': str(error)}
+        result['seconds'] = round(time.monotonic() - start_time, 3)
+        metrics.inc('shop_runs_total', shop=shop.name, status=result['status'])
+        metrics.set_gauge(
+            'shop_last_run_seconds',
+            result['seconds'],
+            shop=shop.name
+        )
+        return result
+
+    @time_of_function
+    def run(self) -> dict[str, dict]:
+        """
+        Метод обрабатывает все магазины и возвращает итоги по магазинам.
+        """
+        try:
+            with ThreadPoolExecutor(
+                max_workers=len(self.shops),
+                thread_name_prefix='shop'
+            ) as executor:
+                results = dict(zip(
+                    (shop.name for shop in self.shops),
+                    executor.map(self._run_shop, self.shops)
+                ))
+        finally:
+            self.download_pool.shutdown()
+            self.render_pool.shutdown()
+        for name, result in results.items():
+            if result['status'] != 'SUCCESS':
+                logger.bot_event(
+                    'Магазин %s: ошибка за %s сек. - %s',
+                    name,
+                    result['seconds'],
+                    result['error']
+                )
+                continue
+            logger.bot_event(
+                'Магазин %s: скачано %s, обрамлено %s, перезаписано '
+                'фидов %s, отложено %s, нерабочих ссылок %s, за %s сек.',
+                name,
+                result['downloaded'],
+                result['framed'],
+                result['rewritten'],
+                result['deferred'],
+                sum(result['dead_links'].values()),
+                result['seconds']
+            )
+        return results
@@ -0,0 +1,129 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from handler.constants import (ADDRESS_FTP_IMAGES, NAME_OF_FRAME, SHOPS_CONFIG,
+                               SHOPS_FOLDER, STATE_FOLDER)
+from handler.exceptions import (PictureRuleError, ShopConfigError,
+                                VariantConfigError)
+from handler.picture_rules import PictureRule, parse_rules
+from handler.variants import ImageVariant, parse_variants
+
+SHOP_FOLDERS = {
+    'feeds_folder': 'temp_feeds',
+    'new_feeds_folder': 'new_feeds',
+    'image_folder': 'old_images',
+    'new_image_folder': 'new_images',
+}
+"""Директории магазина по умолчанию внутри SHOPS_FOLDER/<name>."""
+
+
+@dataclass(frozen=True)
+class Shop:
+    """
+    Описание одного магазина для многомагазинного запуска.
+
+    Магазин задает свои фиды, рамку, директории, префикс ссылок
+    на изображения, правила отбора изображений (пусто - общие)
+    и квоту потоков в общих пулах скачивания и наложения рамки
+    (None - равная доля пула).
+    """
+
+    name: str
+    feeds: tuple[str, ...]
+    feeds_folder: str
+    new_feeds_folder: str
+    image_folder: str
+    new_image_folder: str
+    url_prefix: str = ADDRESS_FTP_IMAGES
+    frame: str = NAME_OF_FRAME
+    variants: tuple[ImageVariant, ...] = ()
+    picture_rules: tuple[PictureRule, ...] = ()
+    quota: int | None = None
+
+    @property
+    def state_folder(self) -> str:
+        """Директория служебного состояния магазина."""
+        return str(Path(STATE_FOLDER) / 'shops' / self.name)
+
+    @property
+    def image_variants(self) -> tuple[ImageVariant, ...]:
+        """Варианты изображений магазина."""
+        return self.variants or (
+            ImageVariant(
+                name='default',
+                folder=self.new_image_folder,
+                url_prefix=self.url_prefix,
+                frame=self.frame
+            ),
+        )
+
+
+def parse_shops(raw_shops: list[dict]) -> tuple[Shop, ...]:
+    """Функция, собирает и валидирует магазины из списка словарей."""
+    if not raw_shops:
+        raise ShopConfigError('Список магазинов пуст')
+    shops = []
+    for raw in raw_shops:
+        raw = dict(raw)
+        name = raw.get('name')
+        if not name or not raw.get('feeds'):
+            raise ShopConfigError(f'У магазина {raw} нет имени или фидов')
+        raw['feeds'] = tuple(raw['feeds'])
+        for field, folder in SHOP_FOLDERS.items():
+            raw.setdefault(field, str(Path(SHOPS_FOLDER) / name / folder))
+        raw_variants = raw.pop('variants', None)
+        if raw_variants:
+            for raw_variant in raw_variants:
+                raw_variant.setdefault('url_prefix', raw.get(
+                    'url_prefix',
+                    ADDRESS_FTP_IMAGES
+                ))
+                raw_variant.setdefault('frame', raw.get(
+                    'frame',
+                    NAME_OF_FRAME
+                ))
+            try:
+                raw['variants'] = parse_variants(raw_variants)
+            except VariantConfigError as error:
+                raise ShopConfigError(f'Магазин {name}: {error}')
+        raw_rules = raw.pop('picture_rules', None)
+        if raw_rules:
+            try:
+                raw['picture_rules'] = parse_rules(raw_rules)
+            except PictureRuleError as error:
+                raise ShopConfigError(f'Магазин {name}: {error}')
+        try:
+            shop = Shop(**raw)
+        except TypeError as error:
+            raise ShopConfigError(f'Некорректный магазин {name}: {error}')
+        if shop.quota is not None and shop.quota < 1:
+            raise ShopConfigError(f'Квота магазина {name} меньше 1')
+        shops.append(shop)
+    names = [shop.name for shop in shops]
+    if len(names) != len(set(names)):
+        raise ShopConfigError('Имена магазинов должны быть уникальными')
+    return tuple(shops)
+
+
+def load_shops(config_path: str = SHOPS_CONFIG) -> tuple[Shop, ...]:
+    """Функция, загружает список магазинов из JSON-файла."""
+    if not config_path:
+        raise ShopConfigError('Не задан путь к конфигурации магазинов')
+    try:
+        with open(
+            Path(__file__).parent.parent / config_path,
+            encoding='utf-8'
+        ) as file:
+            raw_shops = json.load(file)
+    except (OSError, json.JSONDecodeError) as error:
+        logging.error(
+            'Не удалось прочитать конфигурацию магазинов %s: %s',
+            config_path,
+            error
+        )
+        raise ShopConfigError(
+            f'Ошибка чтения конфигурации магазинов: {error}'
+        )
+    return parse_shops(raw_shops)
@@ -2,9 +2,6 @@ import logging
 from pathlib import Path
 
 from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
-from handler.logging_config import setup_logging
-
-setup_logging()
 
 
 def get_filenames_list(folder_name: str) -> list[str]:
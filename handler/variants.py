@@ -0,0 +1,132 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from handler.constants import (ADDRESS_FTP_IMAGES, IMAGE_VARIANTS_CONFIG,
+                               NAME_OF_FRAME, NEW_IMAGE_FOLDER,
+                               NUMBER_PIXELS_CANVAS, NUMBER_PIXELS_IMAGE)
+from handler.exceptions import VariantConfigError
+
+IMAGE_EXTENSIONS = {
+    'PNG': 'png',
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+}
+"""Соответствие форматов кодировщика расширениям файлов."""
+
+ALPHA_FORMATS = ('PNG', 'WEBP')
+"""Форматы, сохраняющие прозрачность."""
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    """
+    Описание одного варианта обработанного изображения.
+
+    Каждый вариант получает свою директорию, свой префикс ссылок
+    для фида и собственные параметры масштаба, отступов, рамки
+    и кодировщика.
+    """
+
+    name: str
+    folder: str
+    url_prefix: str
+    feed_prefix: str = 'new'
+    max_side: int | None = None
+    number_pixels_canvas: int = NUMBER_PIXELS_CANVAS
+    number_pixels_image: int = NUMBER_PIXELS_IMAGE
+    frame: str = NAME_OF_FRAME
+    image_format: str = 'PNG'
+    quality: int | None = None
+
+    @property
+    def extension(self) -> str:
+        """Расширение файлов варианта."""
+        return IMAGE_EXTENSIONS[self.image_format]
+
+    @property
+    def has_alpha(self) -> bool:
+        """Поддерживает ли формат варианта прозрачность."""
+        return self.image_format in ALPHA_FORMATS
+
+    def save_params(self) -> dict:
+        """Параметры, передаваемые кодировщику Pillow."""
+        if self.quality is None:
+            return {}
+        return {'quality': self.quality}
+
+
+def default_variant(
+    folder: str = NEW_IMAGE_FOLDER,
+    number_pixels_canvas: int = NUMBER_PIXELS_CANVAS,
+    number_pixels_image: int = NUMBER_PIXELS_IMAGE
+) -> ImageVariant:
+    """Функция, возвращает вариант, совпадающий с исходным поведением."""
+    return ImageVariant(
+        name='default',
+        folder=folder,
+        url_prefix=ADDRESS_FTP_IMAGES,
+        number_pixels_canvas=number_pixels_canvas,
+        number_pixels_image=number_pixels_image
+    )
+
+
+def parse_variants(raw_variants: list[dict]) -> tuple[ImageVariant, ...]:
+    """Функция, собирает и валидирует варианты из списка словарей."""
+    if not raw_variants:
+        raise VariantConfigError('Список вариантов пуст')
+    variants = []
+    for raw in raw_variants:
+        try:
+            variant = ImageVariant(**raw)
+        except TypeError as error:
+            raise VariantConfigError(f'Некорректный вариант {raw}: {error}')
+        if variant.image_format not in IMAGE_EXTENSIONS:
+            raise VariantConfigError(
+                f'Формат {variant.image_format} варианта '
+                f'{variant.name} не поддерживается'
+            )
+        if variant.max_side is not None and (
+            variant.max_side <= variant.number_pixels_image
+        ):
+            raise VariantConfigError(
+                f'Размер варианта {variant.name} меньше отступов'
+            )
+        variants.append(variant)
+    for field in ('name', 'folder', 'feed_prefix'):
+        values = [getattr(variant, field) for variant in variants]
+        if len(values) != len(set(values)):
+            raise VariantConfigError(
+                f'Поле {field} вариантов должно быть уникальным'
+            )
+    return tuple(variants)
+
+
+def load_variants(
+    config_path: str = IMAGE_VARIANTS_CONFIG
+) -> tuple[ImageVariant, ...]:
+    """
+    Функция, загружает список вариантов из JSON-файла.
+
+    Если путь к конфигурации не задан, возвращает один вариант
+    по умолчанию.
+    """
+    if not config_path:
+        return (default_variant(),)
+    try:
+        with open(
+            Path(__file__).parent.parent / config_path,
+            encoding='utf-8'
+        ) as file:
+            raw_variants = json.load(file)
+    except (OSError, json.JSONDecodeError) as error:
+        logging.error(
+            'Не удалось прочитать конфигурацию вариантов %s: %s',
+            config_path,
+            error
+        )
+        raise VariantConfigError(
+            f'Ошибка чтения конфигурации вариантов: {error}'
+        )
+    return parse_variants(raw_variants)
@@ -0,0 +1,247 @@
+import bisect
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from handler.constants import (STATE_FOLDER, VERIFY_SAMPLE_SIZE,
+                               VERIFY_STATE_FILE, VERIFY_WORKERS)
+from handler.decorators import time_of_function
+from handler.exceptions import DirectoryCreationError, EmptyFeedsListError
+from handler.metrics import metrics
+from handler.mixins import FileMixin
+from handler.publisher import (Publisher, atomic_write, content_hash,
+                               get_publisher)
+from handler.variants import IMAGE_EXTENSIONS, ImageVariant
+
+logger = logging.getLogger(__name__)
+
+END_MARKERS = {
+    'JPEG': b'\xff\xd9',
+    'MPO': b'\xff\xd9',
+    'PNG': b'IEND\xaeB`\x82',
+    'GIF': b';',
+}
+"""Байты, которыми заканчивается целый файл формата."""
+
+
+def probe_image(data: bytes, extension: str) -> str | None:
+    """
+    Функция, проверяет заголовок и окончание файла изображения.
+
+    Пиксели не декодируются: читается заголовок, у PNG сверяются
+    контрольные суммы блоков, у остальных форматов проверяется
+    маркер конца файла или длина из заголовка RIFF.
+    Возвращает причину отказа или None для целого файла.
+    """
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except Exception:
+        return 'corrupt'
+    if not width or not height:
+        return 'corrupt'
+    if extension not in (
+        image_format.lower(),
+        IMAGE_EXTENSIONS.get(image_format)
+    ):
+        return 'format'
+    if image_format == 'WEBP':
+        complete = int.from_bytes(data[4:8], 'little') + 8 == len(data)
+    else:
+        marker = END_MARKERS.get(image_format)
+        complete = marker is None or data.endswith(marker)
+    return None if complete else 'truncated'
+
+
+class ImageVerifier(FileMixin):
+    """
+    Класс проверки целостности сохраненных изображений.
+
+    Проверяет оригиналы и изображения всех вариантов: сверяет размер
+    и хеш файла с манифестом публикации и читает заголовок.
+    Выборочный режим проверяет sample_size файлов каждой директории,
+    продолжая с места прошлой проверки, поэтому за несколько циклов
+    обходит все файлы. Полный режим проверяет все файлы. Испорченный
+    файл удаляется из директории, манифеста и кэша изображений,
+    и следующий план заново скачивает оригинал или строит вариант.
+    """
+
+    def __init__(
+        self,
+        image_client,
+        state_folder: str = STATE_FOLDER,
+        sample_size: int = VERIFY_SAMPLE_SIZE,
+        workers: int = VERIFY_WORKERS
+    ) -> None:
+        self.image_client = image_client
+        self.state_folder = state_folder
+        self.sample_size = sample_size
+        self.workers = workers
+        self.summary: dict[str, int] = {}
+
+    def _cursors_path(self) -> Path:
+        """Защищенный метод, возвращает путь к файлу позиций проверки."""
+        return self._make_dir(self.state_folder) / VERIFY_STATE_FILE
+
+    def _load_cursors(self) -> dict[str, str]:
+        """Защищенный метод, читает позиции выборочной проверки."""
+        file_path = self._cursors_path()
+        if not file_path.exists():
+            return {}
+        try:
+            with open(file_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as error:
+            logging.warning(
+                'Не удалось прочитать позиции проверки: %s',
+                error
+            )
+            return {}
+
+    def _save_cursors(self, cursors: dict[str, str]) -> None:
+        """Защищенный метод, сохраняет позиции выборочной проверки."""
+        atomic_write(
+            self._cursors_path(),
+            json.dumps(cursors, ensure_ascii=False).encode()
+        )
+
+    def _folders(self) -> list[tuple[str, ImageVariant | None]]:
+        """
+        Защищенный метод, возвращает проверяемые директории
+        парами (директория, вариант), у оригиналов вариант None.
+        """
+        folders = [(self.image_client.image_folder, None)]
+        folders.extend(
+            (variant.folder, variant)
+            for variant in self.image_client.variants
+        )
+        return folders
+
+    def _select(
+        self,
+        folder: str,
+        filenames: list[str],
+        cursors: dict[str, str],
+        full: bool
+    ) -> list[str]:
+        """
+        Защищенный метод, отбирает файлы директории для проверки.
+
+        Выборка берется по порядку имен следом за последним
+        проверенным файлом и продолжается с начала списка.
+        """
+        filenames = sorted(
+            filename for filename in filenames
+            if not filename.startswith('.')
+        )
+        if full or len(filenames) <= self.sample_size:
+            return filenames
+        start = bisect.bisect_right(filenames, cursors.get(folder, ''))
+        selected = (filenames[start:] + filenames[:start])[:self.sample_size]
+        cursors[folder] = selected[-1]
+        return selected
+
+    @staticmethod
+    def _check_file(
+        file_path: Path,
+        publisher: Publisher,
+        dry_run: bool
+    ) -> str | None:
+        """
+        Защищенный метод, проверяет один файл.
+
+        Файл без записи в манифесте после успешной проверки
+        заносится в манифест. Возвращает причину отказа или None.
+        """
+        try:
+            data = file_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        entry = publisher.manifest_entry(file_path.name)
+        if entry and (
+            entry[0] != len(data) or entry[1] != content_hash(data)
+        ):
+            return 'hash'
+        reason = probe_image(data, file_path.suffix[1:])
+        if reason is None and entry is None and not dry_run:
+            publisher.record(file_path.name, data)
+        return reason
+
+    @time_of_function
+    def verify(self, full: bool = False, dry_run: bool = False) -> dict:
+        """
+        Метод проверяет изображения и удаляет испорченные.
+
+        Файлы проверяются в workers потоков. Возвращает итоговые
+        счетчики, они же сохраняются в summary.
+        """
+        summary = {'checked': 0, 'bad': 0}
+        if not full and not self.sample_size:
+            self.summary = summary
+            return summary
+        cursors = self._load_cursors()
+        reasons: dict[str, int] = {}
+        for folder, variant in self._folders():
+            try:
+                filenames = self._get_files_list(folder)
+            except (DirectoryCreationError, EmptyFeedsListError):
+                continue
+            folder_path = self._make_dir(folder)
+            publisher = get_publisher(folder)
+            selected = self._select(folder, filenames, cursors, full)
+            kind = 'original' if variant is None else 'image'
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(
+                    lambda filename: self._check_file(
+                        folder_path / filename,
+                        publisher,
+                        dry_run
+                    ),
+                    selected
+                )
+                for filename, reason in zip(selected, results):
+                    summary['checked'] += 1
+                    if reason is None:
+                        continue
+                    summary['bad'] += 1
+                    reasons[reason] = reasons.get(reason, 0) + 1
+                    metrics.inc(
+                        'image_integrity_errors_total',
+                        kind=kind,
+                        reason=reason
+                    )
+                    logging.warning(
+                        'Испорчено изображение %s/%s: %s',
+                        folder,
+                        filename,
+                        reason
+                    )
+                    if dry_run:
+                        continue
+                    (folder_path / filename).unlink(missing_ok=True)
+                    publisher.forget(filename)
+                    self.image_client.discard_image(
+                        filename.split('.')[0],
+                        variant
+                    )
+        if not dry_run and not full:
+            self._save_cursors(cursors)
+        metrics.inc('images_verified_total', summary['checked'])
+        self.summary = {**summary, **reasons}
+        logger.bot_event(
+            'Проверено изображений (%s) - %s, испорчено и поставлено '
+            'в очередь на восстановление - %s%s',
+            'полностью' if full else 'выборочно',
+            summary['checked'],
+            summary['bad'],
+            ' (пробный запуск)' if dry_run else ''
+        )
+        for reason, count in sorted(reasons.items()):
+            logging.info('Причина %s: %s изображений', reason, count)
+        return self.summary